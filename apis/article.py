@@ -1,12 +1,80 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from starlette.concurrency import run_in_threadpool
 from core.auth import get_current_user
-from core.db import DB
+from core.db import DB, ADB
+from sqlalchemy.orm import Session
 from core.models.base import DATA_STATUS
 from core.models.article import Article
 from sqlalchemy import and_, or_
 from .base import success_response, error_response
 from core.config import cfg
 router = APIRouter(prefix=f"/articles", tags=["文章管理"])
+
+def article_list_with_mp_names(session, articles):
+    """合并公众号名称到文章列表"""
+    # 公众号名称从缓存读取，缺失的一次IN查询补齐
+    from core.feed_names import FeedNames, UNKNOWN_FEED_NAME
+    mp_names = FeedNames.get(session, (article.mp_id for article in articles))
+    
+    article_list = []
+    for article in articles:
+        article_dict = article.__dict__
+        article_dict["mp_name"] = mp_names.get(article.mp_id, UNKNOWN_FEED_NAME)
+        article_list.append(article_dict)
+    return article_list
+
+def query_articles(session, offset, limit, status, search, mp_id, cursor, with_total):
+    """查询文章列表，由ADB.run在异步会话或线程池中执行"""
+    # 构建查询条件
+    query = session.query(Article)
+    
+    if status:
+        query = query.filter(Article.status == status)
+    else:
+        query = query.filter(Article.status != DATA_STATUS.DELETED)
+    if mp_id:
+        query = query.filter(Article.mp_id == mp_id)
+    if search:
+        query = query.filter(
+            or_(
+                Article.title.ilike(f"%{search}%"),
+            )
+        )
+    
+    if cursor is not None:
+        # 游标分页，按(publish_time, id)定位，不需要offset和count
+        from core.pagination import keyset_page, TotalCache
+        try:
+            articles, next_cursor = keyset_page(query, Article.publish_time, Article.id, cursor, limit)
+        except ValueError as e:
+            # 参数status覆盖了fastapi.status，这里直接使用状态码
+            raise HTTPException(
+                status_code=400,
+                detail=error_response(code=40001, message=str(e))
+            )
+        result = {
+            "list": article_list_with_mp_names(session, articles),
+            "next_cursor": next_cursor
+        }
+        if with_total:
+            result["total"] = TotalCache.count(("articles", status, mp_id, search), query)
+        return result
+
+    # 获取总数
+    total = query.count()
+    
+    # 分页查询（按发布时间降序）
+    from sqlalchemy import desc
+    articles = query.order_by(desc(Article.publish_time))\
+                   .offset(offset)\
+                   .limit(limit)\
+                   .all()
+    
+    return {
+        "list": article_list_with_mp_names(session, articles),
+        "total": total
+    }
+
 @router.api_route("", summary="获取文章列表",methods= ["GET", "POST"], operation_id="get_articles_list")
 async def get_articles(
     offset: int = Query(0, ge=0),
@@ -14,80 +82,65 @@ async def get_articles(
     status: str = Query(None),
     search: str = Query(None),
     mp_id: str = Query(None),
+    cursor: str = Query(None, description="游标分页：首页传空字符串，之后传上一页返回的next_cursor"),
+    with_total: bool = Query(False, description="游标分页时是否返回总数(缓存值)"),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
-      
-        
-        # 构建查询条件
-        query = session.query(Article)
-        
-        if status:
-            query = query.filter(Article.status == status)
-        else:
-            query = query.filter(Article.status != DATA_STATUS.DELETED)
-        if mp_id:
-            query = query.filter(Article.mp_id == mp_id)
-        if search:
-            query = query.filter(
-                or_(
-                    Article.title.ilike(f"%{search}%"),
-                )
-            )
-        
-        # 获取总数
-        total = query.count()
-        
-        # 分页查询（按发布时间降序）
-        from sqlalchemy import desc
-        articles = query.order_by(desc(Article.publish_time))\
-                       .offset(offset)\
-                       .limit(limit)\
-                       .all()
-        # 打印生成的 SQL 语句
-        print(query.statement.compile(compile_kwargs={"literal_binds": True}))
-        
-        # 查询公众号名称
-        from core.models.feed import Feed
-        mp_names = {}
-        for article in articles:
-            if article.mp_id and article.mp_id not in mp_names:
-                feed = session.query(Feed).filter(Feed.id == article.mp_id).first()
-                mp_names[article.mp_id] = feed.mp_name if feed else "未知公众号"
-        
-        # 合并公众号名称到文章列表
-        article_list = []
-        for article in articles:
-            article_dict = article.__dict__
-            article_dict["mp_name"] = mp_names.get(article.mp_id, "未知公众号")
-            article_list.append(article_dict)
-        
-        from .base import success_response
-        return success_response({
-            "list": article_list,
-            "total": total
-        })
+        return success_response(await ADB.run(query_articles, offset, limit, status, search, mp_id, cursor, with_total))
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            status_code=406,
             detail=error_response(
                 code=50001,
                 message=f"获取文章列表失败: {str(e)}"
             )
         )
 
+@router.get("/search", summary="全文搜索文章")
+async def search_articles(
+    q: str = Query(..., min_length=1, description="搜索关键词，多个词用空格分隔"),
+    limit: int = Query(10, ge=1, le=100),
+    mp_id: str = Query(None),
+    cursor: str = Query(None, description="游标分页：首页不传，之后传上一页返回的next_cursor"),
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
+):
+    """在标题、摘要和正文中搜索，按相关度排序"""
+    from core.search import Search
+    try:
+        articles, next_cursor = Search.search(session, q, mp_id=mp_id, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error_response(code=40001, message=str(e))
+        )
+    return success_response({
+        "list": article_list_with_mp_names(session, articles),
+        "next_cursor": next_cursor
+    })
+
+def query_article_detail(session, article_id):
+    """查询文章详情，文章不存在时返回None"""
+    article = session.query(Article).filter(Article.id==article_id).filter(Article.status != DATA_STATUS.DELETED).first()
+    if not article:
+        return None
+    # 正文单独存表，列表不加载，详情中补充
+    article_dict = article.__dict__
+    article_dict["content"] = article.content
+    article_dict.pop("body", None)
+    return article_dict
+
 @router.get("/{article_id}", summary="获取文章详情")
 async def get_article_detail(
     article_id: str,
     content: bool = False,
     # current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
-        article = session.query(Article).filter(Article.id==article_id).filter(Article.status != DATA_STATUS.DELETED).first()
+        article = await ADB.run(query_article_detail, article_id)
         if not article:
             from .base import error_response
             raise HTTPException(
@@ -112,9 +165,9 @@ async def get_article_detail(
 @router.delete("/{article_id}", summary="删除文章")
 async def delete_article(
     article_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
 ):
-    session = DB.get_session()
     try:
         from core.models.article import Article
         
@@ -129,10 +182,19 @@ async def delete_article(
                 )
             )
         # 逻辑删除文章（更新状态为deleted）
-        article.status = DATA_STATUS.DELETED
+        def remove():
+            article.status = DATA_STATUS.DELETED
+            if cfg.get("article.true_delete", False):
+                session.delete(article)
+                from core.search import Search
+                Search.remove(session, article.id)
+            session.commit()
+        await run_in_threadpool(DB.write, remove)
         if cfg.get("article.true_delete", False):
-            session.delete(article)
-        session.commit()
+            from core.known_articles import KnownArticles
+            KnownArticles.discard(article.mp_id, article.id)
+        from core.rss_cache import RssCache
+        RssCache.invalidate(article.mp_id)
         
         return success_response(None, message="文章已标记为删除")
     except Exception as e:
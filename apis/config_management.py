@@ -38,9 +38,9 @@ def list_configs(
 @router.get("/{config_key}", summary="获取单个配置项详情")
 def get_config(
     config_key: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
-    db=DB.get_session()
     """获取单个配置项详情"""
     try:
         config = db.query(ConfigManagement).filter(ConfigManagement.config_key == config_key).first()
@@ -58,9 +58,9 @@ class ConfigManagementCreate(BaseModel):
 @router.post("", summary="创建配置项")
 def create_config(
     config_data: ConfigManagementCreate = Body(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
-    db=DB.get_session()
     """创建配置项"""
     try:
         # 检查config_key是否已存在
@@ -74,7 +74,7 @@ def create_config(
             description=config_data.description
         )
         db.add(db_config)
-        db.commit()
+        DB.write(db.commit)
         db.refresh(db_config)
         return success_response(data=db_config)
     except Exception as e:
@@ -85,9 +85,9 @@ def create_config(
 def update_config(
     config_key: str=Path(...,min_length=1),
     config_data: ConfigManagementCreate = Body(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
-    db=DB.get_session()
     """更新配置项"""
     try:
         db_config = db.query(ConfigManagement).filter(ConfigManagement.config_key == config_key).first()
@@ -99,7 +99,7 @@ def update_config(
         if config_data.description is not None:
             db_config.description = config_data.description
         
-        db.commit()
+        DB.write(db.commit)
         db.refresh(db_config)
         return success_response(data=db_config)
     except Exception as e:
@@ -109,9 +109,9 @@ def update_config(
 @router.delete("/{config_key}",summary="删除配置项")
 def delete_config(
     config_key: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
-    db=DB.get_session()
     """删除配置项"""
     try:
         db_config = db.query(ConfigManagement).filter(ConfigManagement.config_key == config_key).first()
@@ -119,7 +119,7 @@ def delete_config(
             raise HTTPException(status_code=404, detail="Config not found")
         
         db.delete(db_config)
-        db.commit()
+        DB.write(db.commit)
         return success_response(message="Config deleted successfully")
     except Exception as e:
         db.rollback()
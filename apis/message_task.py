@@ -7,6 +7,7 @@ from typing import List, Optional
 
 # 2. 第三方库导入
 from fastapi import APIRouter, Depends, HTTPException, status,Body,Query
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 # 3. 本地应用/模块导入
@@ -22,9 +23,9 @@ async def list_message_tasks(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     status: Optional[int] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
-    db=DB.get_session()
     """
     获取消息任务列表
     
@@ -63,9 +64,9 @@ async def list_message_tasks(
 @router.get("/{task_id}", summary="获取单个消息任务详情")
 async def get_message_task(
     task_id: int,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
-    db=DB.get_session()
     """
     获取单个消息任务详情
     
@@ -102,7 +103,8 @@ class MessageTaskCreate(BaseModel):
 @router.post("", summary="创建消息任务", status_code=status.HTTP_201_CREATED)
 async def create_message_task(
     task_data: MessageTaskCreate = Body(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
     """
     创建新消息任务
@@ -117,7 +119,6 @@ async def create_message_task(
         400: 请求数据验证失败
         500: 数据库操作异常
     """
-    db=DB.get_session()
     try:
         db_task = MessageTask(
             message_template=task_data.message_template,
@@ -129,7 +130,7 @@ async def create_message_task(
             status=task_data.status if task_data.status is not None else 0
         )
         db.add(db_task)
-        db.commit()
+        await run_in_threadpool(DB.write, db.commit)
         db.refresh(db_task)
         return success_response(data=db_task)
     except Exception as e:
@@ -140,9 +141,9 @@ async def create_message_task(
 async def update_message_task(
     task_id: int,
     task_data: MessageTaskCreate = Body(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
-    db=DB.get_session()
     """
     更新消息任务
     
@@ -177,7 +178,7 @@ async def update_message_task(
             db_task.message_type = task_data.message_type
         if task_data.name is not None:
             db_task.name = task_data.name
-        db.commit()
+        await run_in_threadpool(DB.write, db.commit)
         db.refresh(db_task)
         return success_response(data=db_task)
     except Exception as e:
@@ -187,7 +188,8 @@ async def update_message_task(
 @router.delete("/{task_id}",summary="删除消息任务")
 async def delete_message_task(
     task_id: int,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(DB.session_dependency)
 ):
     """
     删除消息任务
@@ -202,14 +204,13 @@ async def delete_message_task(
         404: 消息任务不存在
         500: 数据库操作异常
     """
-    db=DB.get_session()
     try:
         db_task = db.query(MessageTask).filter(MessageTask.id == task_id).first()
         if not db_task:
             raise HTTPException(status_code=404, detail="Message task not found")
         
         db.delete(db_task)
-        db.commit()
+        await run_in_threadpool(DB.write, db.commit)
         return success_response(message="Message task deleted successfully")
     except Exception as e:
         db.rollback()
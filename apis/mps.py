@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from starlette.concurrency import run_in_threadpool
 from core.auth import get_current_user
-from core.db import DB
+from core.db import DB, ADB
+from sqlalchemy.orm import Session
 from core.wx import search_Biz
 from .base import success_response, error_response
 from datetime import datetime
@@ -9,6 +11,8 @@ from core.res import save_avatar_locally
 router = APIRouter(prefix=f"/mps", tags=["公众号管理"])
 def UpdateArticle(art:dict):
             return DB.add_article(art)
+def UpdateArticles(arts:list):
+            return DB.add_articles(arts)
 @router.get("/search/{kw}", summary="搜索公众号")
 async def search_mp(
     kw: str = "",
@@ -16,9 +20,9 @@ async def search_mp(
     offset: int = 0,
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
-        result = search_Biz(kw)
+        # 请求微信接口和限流等待都是阻塞的，在线程池中执行，不阻塞事件循环
+        result = await run_in_threadpool(search_Biz, kw)
         data={
             'list':result.get('list'),
             'page':{
@@ -38,37 +42,67 @@ async def search_mp(
             )
         )
 
+def feed_list_item(mp):
+    return {
+        "id": mp.id,
+        "mp_name": mp.mp_name,
+        "mp_cover": mp.mp_cover,
+        "mp_intro": mp.mp_intro,
+        "status": mp.status,
+        "created_at": mp.created_at.isoformat()
+    }
+
+def query_mps(session, limit, offset, kw, cursor):
+    """查询公众号列表，由ADB.run在异步会话或线程池中执行"""
+    from core.models.feed import Feed
+    query = session.query(Feed)
+    if kw:
+        query = query.filter(Feed.mp_name.ilike(f"%{kw}%"))
+    if cursor is not None:
+        # 游标分页，按(created_at, id)定位，总数使用缓存值
+        from core.pagination import keyset_page, TotalCache
+        try:
+            mps, next_cursor = keyset_page(query, Feed.created_at, Feed.id, cursor, limit)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=error_response(code=40001, message=str(e))
+            )
+        total = TotalCache.count(("mps", kw), query)
+        return success_response({
+            "list": [feed_list_item(mp) for mp in mps],
+            "page": {
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "total": total
+            },
+            "next_cursor": next_cursor,
+            "total": total
+        })
+    total = query.count()
+    mps = query.order_by(Feed.created_at.desc()).limit(limit).offset(offset).all()
+    return success_response({
+        "list": [feed_list_item(mp) for mp in mps],
+        "page": {
+            "limit": limit,
+            "offset": offset,
+            "total": total
+        },
+        "total": total
+    })
+
 @router.get("", summary="获取公众号列表")
 async def get_mps(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     kw: str = Query(""),
+    cursor: str = Query(None, description="游标分页：首页传空字符串，之后传上一页返回的next_cursor"),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
-        from core.models.feed import Feed
-        query = session.query(Feed)
-        if kw:
-            query = query.filter(Feed.mp_name.ilike(f"%{kw}%"))
-        total = query.count()
-        mps = query.order_by(Feed.created_at.desc()).limit(limit).offset(offset).all()
-        return success_response({
-            "list": [{
-                "id": mp.id,
-                "mp_name": mp.mp_name,
-                "mp_cover": mp.mp_cover,
-                "mp_intro": mp.mp_intro,
-                "status": mp.status,
-                "created_at": mp.created_at.isoformat()
-            } for mp in mps],
-            "page": {
-                "limit": limit,
-                "offset": offset,
-                "total": total
-            },
-            "total": total
-        })
+        return await ADB.run(query_mps, limit, offset, kw, cursor)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"获取公众号列表错误: {str(e)}")
         raise HTTPException(
@@ -82,9 +116,9 @@ async def get_mps(
 @router.get("/update/{mp_id}", summary="更新公众号文章")
 async def update_mps(
      mp_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         mp = session.query(Feed).filter(Feed.id == mp_id).first()
@@ -105,7 +139,8 @@ async def update_mps(
 
         from core.wx import WxGather
         wx=WxGather().Model()
-        wx.get_Articles(mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,CallBack=UpdateArticle)
+        # 采集和限流等待都是阻塞的，在线程池中执行，不阻塞事件循环
+        await run_in_threadpool(wx.get_Articles,mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,BatchCallBack=UpdateArticles)
         result=wx.articles
 
         return success_response({
@@ -128,8 +163,8 @@ async def update_mps(
 async def get_mp(
     mp_id: str,
     # current_user: dict = Depends(get_current_user)
+    session: Session = Depends(DB.session_dependency)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         mp = session.query(Feed).filter(Feed.id == mp_id).first()
@@ -160,9 +195,10 @@ async def add_mp(
     mp_id: str = Body(None, max_length=255),
     avatar: str = Body(None, max_length=500),
     mp_intro: str = Body(None, max_length=255),
-    current_user: dict = Depends(get_current_user)
+    backfill: bool = Body(False),
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         import time
@@ -197,7 +233,12 @@ async def add_mp(
             )
             session.add(new_feed)
            
-        session.commit()
+        await run_in_threadpool(DB.write, session.commit)
+        from core.feed_names import FeedNames
+        FeedNames.invalidate(existing_feed.id if existing_feed else new_feed.id)
+        # 公众号名称、简介会显示在订阅源中
+        from core.rss_cache import RssCache
+        RssCache.invalidate(existing_feed.id if existing_feed else new_feed.id)
         
         feed = existing_feed if existing_feed else new_feed
          #在这里实现第一次添加获取公众号文章
@@ -205,7 +246,10 @@ async def add_mp(
             from core.queue import TaskQueue
             from core.wx import WxGather
             Max_page=int(cfg.get("max_page","2"))
-            TaskQueue.add_task( WxGather().Model().get_Articles,faker_id=feed.faker_id,Mps_id=feed.id,CallBack=UpdateArticle,MaxPage=Max_page,Mps_title=mp_name)
+            TaskQueue.add_task( WxGather().Model().get_Articles,faker_id=feed.faker_id,Mps_id=feed.id,BatchCallBack=UpdateArticles,MaxPage=Max_page,Mps_title=mp_name)
+        if backfill:
+            from core.backfill import Backfill
+            Backfill.start(feed.id)
             
         return success_response({
             "id": feed.id,
@@ -231,9 +275,9 @@ async def add_mp(
 @router.delete("/{mp_id}", summary="删除订阅号")
 async def delete_mp(
     mp_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         mp = session.query(Feed).filter(Feed.id == mp_id).first()
@@ -247,7 +291,11 @@ async def delete_mp(
             )
         
         session.delete(mp)
-        session.commit()
+        await run_in_threadpool(DB.write, session.commit)
+        from core.feed_names import FeedNames
+        FeedNames.invalidate(mp_id)
+        from core.rss_cache import RssCache
+        RssCache.invalidate(mp_id)
         return success_response({
             "message": "订阅号删除成功",
             "id": mp_id
@@ -261,4 +309,54 @@ async def delete_mp(
                 code=50001,
                 message="删除订阅号失败"
             )
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/{mp_id}/backfill", summary="获取历史文章回填进度")
+async def get_backfill(
+    mp_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    from core.backfill import Backfill
+    progress = Backfill.get(mp_id)
+    if progress is None:
+        return error_response(code=40401, message="没有历史文章回填任务")
+    return success_response(progress)
+
+@router.post("/{mp_id}/backfill", summary="开始回填历史文章")
+async def start_backfill(
+    mp_id: str,
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
+):
+    from core.models.feed import Feed
+    from core.backfill import Backfill
+    if not session.query(Feed).filter(Feed.id == mp_id).first():
+        return error_response(code=40401, message="公众号不存在")
+    try:
+        return success_response(Backfill.start(mp_id))
+    except Exception as e:
+        print(f"开始回填历史文章错误: {str(e)}")
+        return error_response(code=50001, message="开始回填历史文章失败")
+
+@router.post("/{mp_id}/backfill/pause", summary="暂停回填历史文章")
+async def pause_backfill(
+    mp_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    from core.backfill import Backfill
+    progress = Backfill.pause(mp_id)
+    if progress is None:
+        return error_response(code=40401, message="没有历史文章回填任务")
+    return success_response(progress)
+
+@router.post("/{mp_id}/backfill/resume", summary="继续回填历史文章")
+async def resume_backfill(
+    mp_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    from core.backfill import Backfill
+    progress = Backfill.resume(mp_id)
+    if progress is None:
+        return error_response(code=40401, message="没有历史文章回填任务")
+    return success_response(progress)
@@ -58,7 +58,8 @@ async def reverse_proxy(request: Request, path: str):
     
     target_url = path
     
-    client = httpx.AsyncClient()
+    from core.http_client import Http
+    client = Http.async_client()
     request_data = await request.body()
     headers = dict(request.headers)
     headers.pop("host", host)
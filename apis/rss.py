@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, Request,Response
 from fastapi import status
-from fastapi.responses import Response
-from core.db import DB
+from fastapi.responses import Response, StreamingResponse
+import anyio
+from core.db import DB, ADB
 from core.rss import RSS
+from core.rss_cache import build_mp_rss, build_feeds_rss, build_aggregate_rss, aggregate_name, AGGREGATE_CACHE_PAGE
+from core.feed_format import FEED_FORMATS
 from core.models.feed import Feed
 from .base import success_response, error_response
 from core.auth import get_current_user
@@ -24,6 +27,93 @@ def verify_rss_access(current_user: dict = Depends(get_current_user)):
         )
     return current_user
 
+def is_not_modified(request: Request, etag: str, mtime: int) -> bool:
+    """
+    判断客户端缓存是否仍然有效
+    :param request: 请求对象，读取If-None-Match/If-Modified-Since
+    :param etag: 当前响应的ETag
+    :param mtime: 缓存文件修改时间
+    :return: 未变化返回True
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        from email.utils import parsedate_to_datetime
+        try:
+            return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def select_encoding(request: Request, encodings: list):
+    """
+    按Accept-Encoding从已生成的预压缩版本中选择编码
+    :param encodings: 可用编码，按服务端优先级排列
+    :return: 选中的编码，没有可用编码时返回None
+    """
+    accepted = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+class ClosingStreamingResponse(StreamingResponse):
+    """发送结束或客户端断开后关闭body_iterator
+
+    客户端断开时Starlette只取消发送任务，不会关闭正在读取的生成器，
+    生成器中的清理(删除临时缓存文件、关闭会话)要等到被回收时才执行
+    """
+    async def stream_response(self, send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
+def cached_rss_response(request: Request, rss: RSS):
+    """
+    返回RSS缓存响应，客户端缓存未变化时返回304，缓存不存在时返回None
+    优先返回客户端支持的预压缩版本
+    """
+    meta = rss.get_meta()
+    if meta is None:
+        return None
+    encoding = select_encoding(request, rss.get_encodings())
+    etag = meta["etag"] if encoding is None else f'{meta["etag"][:-1]}-{encoding}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": meta["last_modified"],
+        "Vary": "Accept-Encoding",
+    }
+    if is_not_modified(request, etag, meta["mtime"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    rss_stream = rss.get_rss_stream(encoding=encoding)
+    if rss_stream is None:
+        return None
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(
+        rss_stream,
+        media_type=rss.media_type,
+        headers=headers
+    )
+
 router = APIRouter(prefix="/rss",tags=["RSS源"])
 
 @router.post("/{feed_id}/api", summary="获取特定RSS源详情")
@@ -58,34 +148,21 @@ async def get_rss_feeds(
     # current_user: dict = Depends(get_current_user)
 ):
     rss=RSS(name=f'all_{limit}_{offset}')
-    rss_xml=rss.get_rss()
-    if rss_xml is not None  and is_update==False:
-         return Response(
-            content=rss_xml,
-            media_type="application/xml"
-        )
+    if is_update==False:
+        response = cached_rss_response(request, rss)
+        if response is not None:
+            return response
+    # 会话在流式输出结束后关闭
     session = DB.get_session()
     try:
-        total = session.query(Feed).count()
-        feeds = session.query(Feed).order_by(Feed.created_at.desc()).limit(limit).offset(offset).all()
-        rss_domain=cfg.get("rss.base_url",request.base_url)
-        # 转换为RSS格式数据
-        rss_list = [{
-            "id": str(feed.id),
-            "title": feed.mp_name,
-            "link":  f"{rss_domain}rss/{feed.id}",
-            "description": feed.mp_intro,
-            "updated": feed.created_at.isoformat()
-        } for feed in feeds]
-        
-        # 生成RSS XML
-        rss_xml = rss.generate_rss(rss_list, title="WeRSS订阅",link=rss_domain)
-        
-        return Response(
-            content=rss_xml,
+        rss_domain=cfg.get("rss.base_url","") or str(request.base_url)
+        # 流式生成RSS XML，同时写入缓存
+        return ClosingStreamingResponse(
+            DB.closing_stream(session, build_feeds_rss(rss, session, limit, offset, rss_domain)),
             media_type="application/xml"
         )
     except Exception as e:
+        session.close()
         print(f"获取RSS订阅列表错误: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_406_NOT_ACCEPTABLE,
@@ -95,6 +172,57 @@ async def get_rss_feeds(
             )
         )
 
+@router.get("/aggregate", summary="获取多个公众号的聚合文章RSS")
+async def get_aggregate_rss(
+    request: Request,
+    mp_ids: str = Query(None, description="公众号ID，多个用逗号分隔，为空时聚合全部公众号"),
+    limit: int = Query(100, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    feed_format: str = Query("rss", description="订阅格式：rss、atom或json"),
+):
+    if feed_format not in FEED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=error_response(
+                code=40403,
+                message="不支持的订阅格式"
+            )
+        )
+    # 去重排序，顺序或重复不同的请求使用同一份缓存
+    ids = sorted({mp_id.strip() for mp_id in mp_ids.split(",") if mp_id.strip()}) if mp_ids else []
+    max_ids = int(cfg.get("rss.aggregate_max_ids", 50) or 50)
+    if len(ids) > max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error_response(code=40001, message=f"聚合的公众号不能超过{max_ids}个")
+        )
+    # 公开接口的参数组合不受限制，只缓存默认的第一页，其他分页直接流式生成，避免缓存文件无限增长
+    cache = (limit, offset) == AGGREGATE_CACHE_PAGE
+    rss=RSS(name=f'{aggregate_name(ids)}_{limit}_{offset}',feed_format=feed_format,cache=cache)
+    if cache:
+        response = cached_rss_response(request, rss)
+        if response is not None:
+            return response
+    # 会话在流式输出结束后关闭
+    session = DB.get_session()
+    try:
+        rss_domain=cfg.get("rss.base_url","") or str(request.base_url)
+        # 按发布时间归并各公众号文章，流式输出并写入缓存
+        return ClosingStreamingResponse(
+            DB.closing_stream(session, build_aggregate_rss(rss, session, ids, limit, offset, rss_domain)),
+            media_type=rss.media_type
+        )
+    except Exception as e:
+        session.close()
+        print(f"获取聚合RSS错误: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=error_response(
+                code=50001,
+                message="获取聚合RSS失败"
+            )
+        )
+
 @router.get("/feed/{content_id}", summary="获取缓存的文章内容")
 async def get_rss_feed(content_id: str):
     rss = RSS()
@@ -162,73 +290,93 @@ async def update_rss_feeds(
 
         return await get_mp_articles_rss(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True)
 
+@router.get("/{feed_id}.{ext}", summary="获取公众号文章订阅源(Atom/JSON Feed)")
+async def get_mp_articles_feed(
+    request: Request,
+    feed_id: str,
+    ext: str,
+    limit: int = Query(100, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: str = Query(None, description="游标分页，下一页地址见响应头Link"),
+):
+    """按扩展名返回不同格式：.atom为Atom 1.0，.json为JSON Feed 1.1，.xml为RSS 2.0"""
+    formats = {serializer.ext: feed_format for feed_format, serializer in FEED_FORMATS.items()}
+    if ext not in formats:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=error_response(
+                code=40403,
+                message="不支持的订阅格式"
+            )
+        )
+    return await get_mp_articles_rss(request=request,feed_id=feed_id, limit=limit,offset=offset, feed_format=formats[ext], cursor=cursor)
+
+def query_rss_feed(session, feed_id, limit, cursor):
+    """查询公众号及游标分页的下一页游标，由ADB.run在异步会话或线程池中执行"""
+    from core.models.article import Article
+    feed = session.query(Feed).filter(Feed.id == feed_id).first()
+    next_cursor = None
+    if feed and cursor is not None:
+        from core.pagination import page_end_cursor
+        next_cursor = page_end_cursor(session.query(Article).filter(Article.mp_id == feed_id), Article.publish_time, Article.id, cursor, limit)
+    return feed, next_cursor
+
 @router.get("/{feed_id}", summary="获取公众号文章RSS")
 async def get_mp_articles_rss(
     request: Request,
     feed_id: str,
     limit: int = Query(100, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    is_update:bool=False
+    is_update:bool=False,
+    feed_format: str = "rss",
+    cursor: str = None,
     # current_user: dict = Depends(get_current_user)
 ):
-    rss=RSS(name=f'{feed_id}_{limit}_{offset}')
-    rss_xml = rss.get_rss()
-    if rss_xml is not None and is_update==False:
-         return Response(
-            content=rss_xml,
-            media_type="application/xml"
+    if feed_format not in FEED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=error_response(
+                code=40403,
+                message="不支持的订阅格式"
+            )
         )
-    session = DB.get_session()
+    # 游标分页的页面不缓存，直接流式生成
+    rss=RSS(name=f'{feed_id}_{limit}_{offset}',feed_format=feed_format,cache=cursor is None)
+    if is_update==False and cursor is None:
+        response = cached_rss_response(request, rss)
+        if response is not None:
+            return response
+    # 查询公众号信息，不阻塞事件循环
     try:
-        from core.models.article import Article
-        
-        # 查询公众号信息
-        feed = session.query(Feed).filter(Feed.id == feed_id).first()
-        if not feed:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=error_response(
-                    code=40401,
-                    message="公众号不存在"
-                )
+        feed, next_cursor = await ADB.run(query_rss_feed, feed_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error_response(code=40001, message=str(e))
+        )
+    if not feed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=error_response(
+                code=40401,
+                message="公众号不存在"
             )
-        
-        # 查询文章列表
-        total = session.query(Article).filter(Article.mp_id == feed_id).count()
-        articles = session.query(Article).filter(Article.mp_id == feed_id)\
-            .order_by(Article.publish_time.desc()).limit(limit).offset(offset).all()
-        rss_domain=cfg.get("rss.base_url",request.base_url)
-        # 转换为RSS格式数据
-        import datetime
-        rss_list = [{
-            "id": str(article.id),
-            "title": article.title,
-            "link":  f"{rss_domain}rss/feed/{article.id}" if cfg.get("rss.local",False) else article.url,
-            "description": article.description if article.description != "" else article.title,
-            "content": article.content,
-            "updated": datetime.datetime.fromtimestamp(article.publish_time)
-        } for article in articles]
-        
-
-        # 缓存文章内容
-        for article in articles:
-            content_data = {
-                "id": article.id,
-                "title": article.title,
-                "content": article.content,
-                "publish_time": article.publish_time,
-                "mp_id": article.mp_id,
-                "mp_name": feed.mp_name
-            }
-            rss.cache_content(article.id, content_data)
-        
-        # 生成RSS XML
-        rss_xml = rss.generate_rss(rss_list, title=f"{feed.mp_name}",link=rss_domain,description=feed.mp_intro)
-        
-        return Response(
-            content=rss_xml,
-            media_type="application/xml"
+        )
+    rss_domain=cfg.get("rss.base_url","") or str(request.base_url)
+    headers = {}
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    # 流式输出在线程池中读取数据，会话在输出结束后关闭
+    session = DB.get_session()
+    try:
+        # 生成RSS XML，逐条缓存文章内容并流式输出
+        return ClosingStreamingResponse(
+            DB.closing_stream(session, build_mp_rss(rss, session, feed, limit, offset, rss_domain, cursor=cursor)),
+            media_type=rss.media_type,
+            headers=headers
         )
     except Exception as e:
+        session.close()
         print(f"获取公众号文章RSS错误:",e)
         raise e
\ No newline at end of file
@@ -23,10 +23,14 @@ async def get_system_info(
         - python_version: Python版本
         - uptime: 服务器运行时间(秒)
         - system: 系统详细信息
+        - db_pool: 数据库连接池使用情况
+        - rate_limit: 微信接口限流令牌桶的当前速率
     """
     try:
         from .ver import API_VERSION
         from core.ver import VERSION as CORE_VERSION,LATEST_VERSION
+        from core.db import DB
+        from core.rate_limit import RateLimit
         # 获取系统信息
         system_info = {
             'os': {
@@ -44,7 +48,9 @@ async def get_system_info(
             'api_version': API_VERSION,
             'core_version': CORE_VERSION,
             'latest_version':LATEST_VERSION,
-            'need_update':CORE_VERSION != LATEST_VERSION
+            'need_update':CORE_VERSION != LATEST_VERSION,
+            'db_pool': DB.pool_status(),
+            'rate_limit': RateLimit.status()
         }
         return success_response(data=system_info)
     except Exception as e:
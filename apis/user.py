@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 from core.auth import get_current_user
 from core.db import DB
+from sqlalchemy.orm import Session
 from core.models import User as DBUser
 from core.auth import pwd_context
 import os
@@ -9,8 +11,7 @@ from .base import success_response, error_response
 router = APIRouter(prefix="/user", tags=["用户管理"])
 
 @router.get("", summary="获取用户信息")
-async def get_user_info(current_user: dict = Depends(get_current_user)):
-    session = DB.get_session()
+async def get_user_info(current_user: dict = Depends(get_current_user), session: Session = Depends(DB.session_dependency)):
     try:
         user = session.query(DBUser).filter(
             DBUser.username == current_user["username"]
@@ -45,10 +46,10 @@ async def get_user_info(current_user: dict = Depends(get_current_user)):
 @router.put("", summary="修改用户资料")
 async def update_user_info(
     update_data: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
 ):
     """修改用户基本信息(不包括密码)"""
-    session = DB.get_session()
     try:
         user = session.query(DBUser).filter(
             DBUser.username == current_user["username"]
@@ -78,7 +79,7 @@ async def update_user_info(
             user.is_active = bool(update_data["is_active"])
         
         user.updated_at = datetime.now()
-        session.commit()
+        await run_in_threadpool(DB.write, session.commit)
         return success_response(message="更新成功")
     except HTTPException as e:
         raise e
@@ -93,10 +94,10 @@ async def update_user_info(
 @router.put("/password", summary="修改密码")
 async def change_password(
     password_data: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
 ):
     """修改用户密码"""
-    session = DB.get_session()
     try:
         # 验证请求数据
         if "old_password" not in password_data or "new_password" not in password_data:
@@ -149,7 +150,7 @@ async def change_password(
         # 更新密码
         user.password_hash = pwd_context.hash(new_password)
         user.updated_at = datetime.now()
-        session.commit()
+        await run_in_threadpool(DB.write, session.commit)
         
         # 清除用户缓存，确保新密码立即生效
         from core.auth import clear_user_cache
@@ -171,7 +172,8 @@ import typing
 async def upload_avatar(
     file: UploadFile = File(...),
     # file: typing.Optional[UploadFile] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    session: Session = Depends(DB.session_dependency)
 ):
     """处理用户头像上传"""
     try:
@@ -185,14 +187,13 @@ async def upload_avatar(
             buffer.write(await file.read())
         
         # 更新用户头像字段
-        session = DB.get_session()
         try:
             user = session.query(DBUser).filter(
                 DBUser.username == current_user["username"]
             ).first()
             if user:
                 user.avatar = f"/{avatar_path}/{current_user['username']}.jpg"
-                session.commit()
+                await run_in_threadpool(DB.write, session.commit)
         except Exception as e:
             session.rollback()
             raise HTTPException(
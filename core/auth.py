@@ -61,6 +61,8 @@ def get_user(username: str) -> Optional[DBUser]:
     except Exception as e:
         print(f"获取用户错误: {str(e)}")
         return None
+    finally:
+        session.close()
         
 def clear_user_cache(username: str):
     """清除指定用户的缓存"""
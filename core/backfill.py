@@ -0,0 +1,186 @@
+import math
+import threading
+from datetime import datetime
+from core.config import cfg
+from core.print import print_error, print_info, print_success, print_warning
+
+class BackfillManager:
+    """公众号历史文章回填
+
+    在后台线程中从最新一页开始逐段翻完公众号的全部历史文章，
+    每段backfill.chunk_pages页，段与段之间暂停backfill.interval秒，
+    请求速率同时受微信接口限流控制，不挤占定时同步的请求额度。
+    每页文章批量入库，进度(下一页位置、估算总数)保存在backfill_jobs表中，
+    暂停、出错或进程重启后可从进度处继续。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread = None
+        self._ready = False
+
+    def _setup(self) -> None:
+        """旧数据库没有回填任务表时自动创建"""
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                from core.db import DB
+                from core.models.backfill_job import BackfillJob
+                BackfillJob.__table__.create(DB.get_engine(), checkfirst=True)
+                self._ready = True
+
+    def _update(self, mp_id: str, create: bool = False, **values):
+        """更新回填任务并返回进度，任务不存在且create为False时返回None"""
+        from core.db import DB
+        def update():
+            from core.models.backfill_job import BackfillJob
+            with DB.session_scope() as session:
+                job = session.get(BackfillJob, mp_id)
+                if job is None:
+                    if not create:
+                        return None
+                    job = BackfillJob(mp_id=mp_id, page_begin=0, created_at=datetime.now())
+                    session.add(job)
+                for key, value in values.items():
+                    setattr(job, key, value)
+                job.updated_at = datetime.now()
+                session.commit()
+                return self.progress(job)
+        self._setup()
+        return DB.write(update)
+
+    @staticmethod
+    def progress(job) -> dict:
+        """回填进度，总页数根据接口返回的总数估算"""
+        from core.models.base import DATA_STATUS
+        size = job.page_size or 5
+        pages_done = (job.page_begin or 0) // size
+        total_pages = math.ceil(job.total_count / size) if job.total_count else None
+        if job.status == DATA_STATUS.COMPLETED:
+            total_pages = pages_done
+        return {
+            "mp_id": job.mp_id,
+            "status": {
+                DATA_STATUS.PENDING: "running",
+                DATA_STATUS.INACTIVE: "paused",
+                DATA_STATUS.COMPLETED: "completed",
+                DATA_STATUS.FAILED: "failed",
+            }.get(job.status, "unknown"),
+            "pages_done": pages_done,
+            "total_pages": total_pages,
+            "percent": round(min(100.0, pages_done * 100 / total_pages), 1) if total_pages else None,
+            "message": job.message,
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        }
+
+    def get(self, mp_id: str):
+        """查询回填进度，没有回填任务时返回None"""
+        from core.db import DB
+        from core.models.backfill_job import BackfillJob
+        self._setup()
+        with DB.session_scope() as session:
+            job = session.get(BackfillJob, mp_id)
+            return self.progress(job) if job is not None else None
+
+    def start(self, mp_id: str) -> dict:
+        """开始回填，已完成的任务从头重新回填，未完成的任务从进度处继续"""
+        from core.models.base import DATA_STATUS
+        current = self.get(mp_id)
+        values = {"status": DATA_STATUS.PENDING, "message": None}
+        if current is None or current["status"] == "completed":
+            values["page_begin"] = 0
+        job = self._update(mp_id, create=True, **values)
+        self.run_background()
+        return job
+
+    def pause(self, mp_id: str):
+        """暂停回填，正在采集的一段完成后停止"""
+        from core.models.base import DATA_STATUS
+        return self._update(mp_id, status=DATA_STATUS.INACTIVE)
+
+    def resume(self, mp_id: str):
+        """继续暂停或出错的回填"""
+        from core.models.base import DATA_STATUS
+        job = self._update(mp_id, status=DATA_STATUS.PENDING, message=None)
+        if job is not None:
+            self.run_background()
+        return job
+
+    def _next_job(self):
+        from core.db import DB
+        from core.models.backfill_job import BackfillJob
+        from core.models.base import DATA_STATUS
+        self._setup()
+        with DB.session_scope() as session:
+            job = session.query(BackfillJob).filter(BackfillJob.status == DATA_STATUS.PENDING)\
+                .order_by(BackfillJob.updated_at).first()
+            if job is not None:
+                session.expunge(job)
+            return job
+
+    def run_chunk(self, job) -> None:
+        """回填一段，更新进度"""
+        from core.db import DB
+        from core.models.base import DATA_STATUS
+        from core.models.feed import Feed
+        from core.wx import WxGather
+        with DB.session_scope() as session:
+            feed = session.get(Feed, job.mp_id)
+            if feed is not None:
+                session.expunge(feed)
+        if feed is None:
+            self._update(job.mp_id, status=DATA_STATUS.FAILED, message="公众号不存在")
+            return
+        chunk = max(1, int(cfg.get("backfill.chunk_pages", 5)))
+        wx = WxGather().Model()
+        wx.backfill = state = {"begin": job.page_begin or 0}
+        error = None
+        try:
+            wx.get_Articles(feed.faker_id, Mps_id=feed.id, Mps_title=feed.mp_name,
+                            BatchCallBack=DB.add_articles, MaxPage=chunk)
+        except Exception as e:
+            error = str(e)
+        values = {"page_begin": state.get("next_begin", job.page_begin), "page_size": state.get("count", 5)}
+        if state.get("total"):
+            values["total_count"] = state["total"]
+        if state.get("failed") or (error and not state.get("done")):
+            values.update(status=DATA_STATUS.FAILED, message=error or "采集出错")
+            print_error(f"公众号[{feed.mp_name}]历史回填出错，已暂停: {values['message']}")
+        elif values["page_begin"] < state.get("begin", 0) + chunk * values["page_size"]:
+            # 本段未翻满说明已到最早的文章
+            values["status"] = DATA_STATUS.COMPLETED
+            print_success(f"公众号[{feed.mp_name}]历史回填完成，共{values['page_begin'] // values['page_size']}页")
+        progress = self._update(job.mp_id, **values)
+        if progress is not None and progress["status"] == "running":
+            print_info(f"公众号[{feed.mp_name}]历史回填进度: {progress['pages_done']}/{progress['total_pages'] or '?'}页")
+
+    def _run(self) -> None:
+        while True:
+            try:
+                job = self._next_job()
+            except Exception as e:
+                print_warning(f"读取回填任务失败: {e}")
+                job = None
+            if job is None:
+                self._event.wait()
+                self._event.clear()
+                continue
+            try:
+                self.run_chunk(job)
+            except Exception as e:
+                print_error(f"历史回填失败: {e}")
+            # 段与段之间暂停，给定时同步留出请求额度
+            self._event.wait(float(cfg.get("backfill.interval", 10)))
+            self._event.clear()
+
+    def run_background(self) -> None:
+        """启动后台回填线程，有未完成的任务时继续回填"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._event.set()
+
+Backfill = BackfillManager()
@@ -0,0 +1,98 @@
+import threading
+from datetime import datetime
+from core.print import print_info, print_warning
+
+class CheckpointStore:
+    """公众号采集断点
+
+    每采集完一页(文章已入库)记录下一页的位置和最后一篇文章ID，
+    采集正常结束时标记完成。进程重启、登录失效等原因中断后，
+    下次采集该公众号时先采集最新文章，再跳到断点继续翻到原定的结束页，
+    断点之前已采集的页不再重复下载。
+    断点读写失败只打印警告，不影响采集。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _setup(self) -> None:
+        """旧数据库没有断点表时自动创建"""
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                from core.db import DB
+                from core.models.gather_checkpoint import GatherCheckpoint
+                GatherCheckpoint.__table__.create(DB.get_engine(), checkfirst=True)
+                self._ready = True
+
+    def _save(self, mp_id: str, **values) -> None:
+        from core.db import DB
+        def save():
+            from core.models.gather_checkpoint import GatherCheckpoint
+            with DB.session_scope() as session:
+                item = session.get(GatherCheckpoint, mp_id)
+                if item is None:
+                    item = GatherCheckpoint(mp_id=mp_id)
+                    session.add(item)
+                for key, value in values.items():
+                    setattr(item, key, value)
+                item.updated_at = datetime.now()
+                session.commit()
+        try:
+            self._setup()
+            DB.write(save)
+        except Exception as e:
+            print_warning(f"保存公众号[{mp_id}]采集断点失败: {e}")
+
+    def get(self, mp_id: str):
+        from core.db import DB
+        from core.models.gather_checkpoint import GatherCheckpoint
+        try:
+            self._setup()
+            with DB.session_scope() as session:
+                item = session.get(GatherCheckpoint, mp_id)
+                if item is not None:
+                    session.expunge(item)
+                return item
+        except Exception as e:
+            print_warning(f"读取公众号[{mp_id}]采集断点失败: {e}")
+            return None
+
+    def start(self, mp_id: str, count: int, max_page: int):
+        """
+        开始采集公众号，读取上次未完成的断点
+        :param count: 每页文章数
+        :param max_page: 本次要采集的页数
+        :return: (结束页(不包含), 断点)，断点为(页, 断点前最后一篇文章ID)，上次采集已完成时为None
+        """
+        from core.models.base import DATA_STATUS
+        item = self.get(mp_id)
+        if item is not None and item.status != DATA_STATUS.COMPLETED and 0 < (item.page_begin or 0) < (item.page_end or 0):
+            page, end = item.page_begin // count, -(-item.page_end // count)
+            end = max(end, max_page)
+            print_info(f"公众号[{mp_id}]上次采集未完成，采集最新文章后从第{page + 1}页继续采集到第{end}页")
+            self._save(mp_id, status=DATA_STATUS.PENDING, page_end=end * count)
+            return end, (page, item.last_aid)
+        self._save(mp_id, status=DATA_STATUS.PENDING, page_begin=0, page_end=max_page * count, last_aid=None)
+        return max_page, None
+
+    def advance(self, mp_id: str, next_begin: int, last_aid: str = None) -> None:
+        """一页采集并入库完成"""
+        values = {"page_begin": next_begin}
+        if last_aid is not None:
+            values["last_aid"] = str(last_aid)
+        self._save(mp_id, **values)
+
+    def finish(self, mp_id: str) -> None:
+        """采集正常结束"""
+        from core.models.base import DATA_STATUS
+        self._save(mp_id, status=DATA_STATUS.COMPLETED)
+
+    def fail(self, mp_id: str) -> None:
+        """采集出错，保留断点，下次继续"""
+        from core.models.base import DATA_STATUS
+        self._save(mp_id, status=DATA_STATUS.FAILED)
+
+Checkpoints = CheckpointStore()
@@ -0,0 +1,240 @@
+import asyncio
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# 本模块会在子进程中导入，只能依赖标准库和HTML解析库，不要导入数据库等有副作用的模块
+
+_WIDTH_RE = re.compile(r'width\s*:\s*\d+\s*px')
+
+def _fix_style(style: str) -> str:
+    # 使用正则表达式替换width属性，设置宽度为1080p
+    return _WIDTH_RE.sub('width: 1080px', style)
+
+class HtmlExtractor:
+    """正文提取后端
+
+    从文章页面中找到div#js_content，移除正文的style(visibility: hidden)，
+    图片data-src改为src直接加载，并修正图片宽度，输出紧凑的HTML。
+    """
+    name = ""
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def extract(self, text: str):
+        """返回正文HTML，未找到正文时返回None"""
+        raise NotImplementedError
+
+class SoupExtractor(HtmlExtractor):
+    """BeautifulSoup(html.parser)，纯Python实现，始终可用"""
+    name = "bs4"
+
+    def extract(self, text: str):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(text, 'html.parser')
+        js_content_div = soup.find('div', {'id': 'js_content'})
+        if js_content_div is None:
+            return
+        js_content_div.attrs.pop('style', None)
+        for img_tag in js_content_div.find_all('img'):
+            if 'data-src' in img_tag.attrs:
+                img_tag['src'] = img_tag['data-src']
+                del img_tag['data-src']
+            if 'style' in img_tag.attrs:
+                img_tag['style'] = _fix_style(img_tag['style'])
+        return str(js_content_div)
+
+class LxmlExtractor(HtmlExtractor):
+    """lxml，基于libxml2"""
+    name = "lxml"
+
+    @classmethod
+    def available(cls) -> bool:
+        return lxml_html is not None
+
+    def extract(self, text: str):
+        if not text or not text.strip():
+            return
+        nodes = lxml_html.fromstring(text).xpath("//div[@id='js_content']")
+        if not nodes:
+            return
+        js_content_div = nodes[0]
+        js_content_div.attrib.pop('style', None)
+        for img_tag in js_content_div.iter('img'):
+            src = img_tag.attrib.pop('data-src', None)
+            if src is not None:
+                img_tag.set('src', src)
+            style = img_tag.get('style')
+            if style is not None:
+                img_tag.set('style', _fix_style(style))
+        # tail是div之后的文本，不属于正文
+        js_content_div.tail = None
+        return lxml_html.tostring(js_content_div, encoding='unicode')
+
+class SelectolaxExtractor(HtmlExtractor):
+    """selectolax(lexbor)，C实现的HTML5解析器"""
+    name = "selectolax"
+
+    @classmethod
+    def available(cls) -> bool:
+        return LexborHTMLParser is not None
+
+    def extract(self, text: str):
+        js_content_div = LexborHTMLParser(text).css_first('div#js_content')
+        if js_content_div is None:
+            return
+        if 'style' in js_content_div.attrs:
+            del js_content_div.attrs['style']
+        for img_tag in js_content_div.css('img'):
+            attrs = img_tag.attrs
+            if 'data-src' in attrs:
+                attrs['src'] = attrs['data-src']
+                del attrs['data-src']
+            style = attrs.get('style')
+            if style is not None:
+                attrs['style'] = _fix_style(style)
+        return js_content_div.html
+
+# auto时按顺序选择第一个可用的后端
+EXTRACTORS = {cls.name: cls for cls in (SelectolaxExtractor, LxmlExtractor, SoupExtractor)}
+_instances = {}
+
+def resolve_backend(name: str = "auto") -> str:
+    """返回可用的后端名称，指定的后端未安装时依次尝试其他后端"""
+    if name in EXTRACTORS and EXTRACTORS[name].available():
+        return name
+    for backend, cls in EXTRACTORS.items():
+        if cls.available():
+            return backend
+    return SoupExtractor.name
+
+def extract_js_content(text: str, backend: str = "auto"):
+    """从文章页面HTML中提取正文，图片改为直接加载，未找到正文时返回None"""
+    backend = resolve_backend(backend)
+    extractor = _instances.get(backend)
+    if extractor is None:
+        extractor = _instances[backend] = EXTRACTORS[backend]()
+    return extractor.extract(text)
+
+def benchmark(text: str, number: int = 20) -> dict:
+    """
+    对比各可用后端提取同一页面的耗时
+    :return: 后端名称到平均耗时(秒)和输出长度的映射
+    """
+    import time
+    result = {}
+    for backend, cls in EXTRACTORS.items():
+        if not cls.available():
+            continue
+        content = extract_js_content(text, backend)
+        start = time.perf_counter()
+        for _ in range(number):
+            extract_js_content(text, backend)
+        result[backend] = {"seconds": (time.perf_counter() - start) / number, "size": len(content or "")}
+    return result
+
+class ContentExtractor:
+    """文章正文提取进程池
+
+    解析HTML和prettify是CPU密集操作，放到独立进程中执行，
+    采集线程提交页面后继续抓取下一篇，网络请求和解析在多个CPU核上重叠进行。
+    进程数由gather.extract_workers设置，为0时在当前线程中解析。
+    解析后端由gather.extractor设置，可使用benchmark对比各后端的速度。
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._lock = threading.Lock()
+        self._disabled = False
+
+    def _workers(self) -> int:
+        from core.config import cfg
+        value = cfg.get("gather.extract_workers", None)
+        if value is None or value == "":
+            return min(4, os.cpu_count() or 1)
+        return int(value)
+
+    def backend(self) -> str:
+        from core.config import cfg
+        return resolve_backend(cfg.get("gather.extractor", "auto") or "auto")
+
+    def _get_pool(self):
+        if self._disabled:
+            return None
+        with self._lock:
+            if self._pool is None:
+                workers = self._workers()
+                if workers <= 0:
+                    self._disabled = True
+                    return None
+                # spawn启动的子进程不继承父进程的线程和锁，避免在多线程进程中fork
+                self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _reset(self, pool) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, text: str) -> Future:
+        """提交页面HTML，返回正文的Future"""
+        backend = self.backend()
+        pool = self._get_pool()
+        if pool is not None:
+            try:
+                return pool.submit(extract_js_content, text, backend)
+            except (BrokenProcessPool, RuntimeError) as e:
+                from core.print import print_warning
+                print_warning(f"正文解析进程池不可用，改为在当前线程解析: {e}")
+                self._disabled = True
+                self._reset(pool)
+        future = Future()
+        try:
+            future.set_result(extract_js_content(text, backend))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def parse(self, text: str):
+        """同步解析页面HTML，返回正文"""
+        future = self.submit(text)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # 子进程异常退出，重建进程池后重新提交一次
+            self.shutdown()
+            return self.submit(text).result()
+
+    async def parse_async(self, text: str):
+        """异步解析页面HTML，等待时不阻塞事件循环"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+Extractor = ContentExtractor()
+
+if __name__ == '__main__':
+    # 用法: python -m core.content_extract 文章页面.html [次数]
+    import sys
+    with open(sys.argv[1], encoding='utf-8') as f:
+        page = f.read()
+    for name, item in benchmark(page, int(sys.argv[2]) if len(sys.argv) > 2 else 20).items():
+        print(f"{name}: {item['seconds'] * 1000:.2f}ms, {item['size']}字符")
@@ -0,0 +1,86 @@
+import sqlite3
+import threading
+import hashlib
+import json
+from typing import Optional
+
+class ContentStore:
+    """文章内容存储
+
+    所有缓存的文章内容保存在同一个SQLite文件的一张表中，替代每篇文章一个JSON文件，
+    按内容哈希判断是否变化，未变化的内容不重复写入。
+    每条内容还可以保存一个来源指纹(处理前原始数据的哈希)，
+    调用方可以先比较指纹，原始数据未变化时跳过内容处理。
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: SQLite文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS contents ("
+            "id TEXT PRIMARY KEY, hash TEXT NOT NULL, data BLOB NOT NULL, source TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(contents)")]
+        if "source" not in columns:
+            self._conn.execute("ALTER TABLE contents ADD COLUMN source TEXT")
+
+    def get(self, content_id: str) -> Optional[dict]:
+        """读取文章内容，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM contents WHERE id=?", (content_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def fingerprint(self, content_id: str) -> Optional[str]:
+        """读取文章内容的来源指纹，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT source FROM contents WHERE id=?", (content_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, content_id: str, content: dict, source: str = None) -> bool:
+        """写入文章内容
+
+        :param source: 来源指纹
+        :return: 内容有变化并写入时返回True，内容未变化时返回False
+        """
+        data = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.md5(data).hexdigest()
+        with self._lock:
+            row = self._conn.execute("SELECT hash FROM contents WHERE id=?", (content_id,)).fetchone()
+            if row is not None and row[0] == digest:
+                if source is not None:
+                    self._conn.execute("UPDATE contents SET source=? WHERE id=?", (source, content_id))
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contents (id, hash, data, source) VALUES (?, ?, ?, ?)",
+                (content_id, digest, data, source)
+            )
+        return True
+
+    def delete(self, content_id: str) -> None:
+        """删除文章内容"""
+        with self._lock:
+            self._conn.execute("DELETE FROM contents WHERE id=?", (content_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_content_store(path: str) -> ContentStore:
+    """获取指定路径的内容存储，同一路径在进程内共享一个实例"""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = ContentStore(path)
+            _stores[path] = store
+        return store
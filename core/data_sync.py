@@ -3,8 +3,11 @@ from sqlalchemy.engine import Engine
 from typing import List, Type
 from .models.base import Base
 from .models.article import Article
+from .models.article_content import ArticleContent
+from .models.backfill_job import BackfillJob
 from .models.config_management import ConfigManagement
 from .models.feed import Feed
+from .models.gather_checkpoint import GatherCheckpoint
 from .models.message_task import MessageTask
 from .models.user import User
 def printf(*args):
@@ -33,8 +36,11 @@ class ModelSync:
                 conn.execute(text("SELECT 1"))
             self.models: List[Type[Base]] = [
                 Article,
+                ArticleContent,
+                BackfillJob,
                 ConfigManagement,
                 Feed,
+                GatherCheckpoint,
                 MessageTask,
                 User
             ]
@@ -133,6 +139,7 @@ class ModelSync:
                     conn.execute(text(create_sql))
                     
                 printf(f"[SYNC] 表 {table_name} 创建成功，包含 {len(primary_keys)} 个主键和 {len(foreign_keys)} 个外键")
+                self.sync_indexes(model)
                 return
             
             # 获取数据库表列和模型列
@@ -177,10 +184,42 @@ class ModelSync:
                     else:
                         printf(f"[SYNC] 表 {table_name} 列 {col_name} 类型、默认值和约束一致({db_type_str})")
             
+            self.sync_indexes(model)
             printf(f"[SYNC] 表 {table_name} 同步完成")
         except Exception as e:
             printf(f"[ERROR] 同步表 {table_name} 失败: {str(e)}")
             raise
+
+    def sync_indexes(self, model: Type[Base]) -> None:
+        """
+        同步模型中定义的索引(__table_args__中的Index)
+        缺少的索引会被创建，同名但列不一致的索引会被重建
+        :param model: 模型类
+        """
+        table = model.__table__
+        table_name = table.name
+        inspector = inspect(self.engine)
+        db_indexes = {idx['name']: idx for idx in inspector.get_indexes(table_name)}
+        for index in table.indexes:
+            columns = [col.name for col in index.columns]
+            db_index = db_indexes.get(index.name)
+            if db_index is not None:
+                if list(db_index.get('column_names') or []) == columns:
+                    printf(f"[SYNC] 表 {table_name} 索引 {index.name}{columns} 一致")
+                    continue
+                printf(f"[SYNC] 表 {table_name} 索引 {index.name} 列不一致: 数据库({db_index.get('column_names')}) vs 模型({columns})，重建索引")
+                with self.engine.begin() as conn:
+                    index.drop(bind=conn)
+            try:
+                with self.engine.begin() as conn:
+                    if self.get_database_type() == 'sqlite':
+                        # SQLite连接缓存的表结构在其他连接重建表后可能过期，先读取一次使其重新加载
+                        conn.execute(text("SELECT count(*) FROM sqlite_master"))
+                    index.create(bind=conn)
+                printf(f"[SYNC] 表 {table_name} 创建索引 {index.name}{columns} 成功")
+            except Exception as e:
+                printf(f"[ERROR] 表 {table_name} 创建索引 {index.name} 失败: {str(e)}")
+                raise
     
     def get_database_type(self) -> str:
         """获取数据库类型，支持多种常见数据库"""
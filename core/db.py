@@ -1,19 +1,62 @@
 from sqlalchemy import create_engine, Engine,Text
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker, declarative_base, undefer
 from sqlalchemy import Column, Integer, String, DateTime
-from typing import Optional, List
-from .models import Feed, Article
+from typing import Optional, List, Iterator
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from .models import Feed, Article, ArticleContent
 from .config import cfg
 from core.models.base import Base  
 from core.print import print_warning,print_info,print_error
 # 声明基类
 # Base = declarative_base()
 
+def sqlite_connect_listener():
+    """返回设置SQLite连接参数的connect事件监听函数"""
+    busy_timeout = int(cfg.get("sqlite.busy_timeout", 5000))
+    mmap_size = int(cfg.get("sqlite.mmap_size", 268435456))
+    def on_connect(dbapi_conn, conn_record):
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+            cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+        finally:
+            cursor.close()
+    return on_connect
+
+class SqliteWriter:
+    """SQLite单写线程
+
+    SQLite同一时间只允许一个写事务，多个线程同时提交时会互相等待直至"database is locked"。
+    所有写操作提交到同一个线程按顺序执行，读操作不经过该线程，在WAL模式下可以并发进行。
+    采集入库、断点、回填任务以及API的增删改都通过Db.write执行，
+    只有启动时单线程执行的初始化和数据迁移直接提交。
+    """
+
+    def __init__(self):
+        self._ident = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer", initializer=self._mark)
+
+    def _mark(self) -> None:
+        self._ident = threading.get_ident()
+
+    def submit(self, func, *args, **kwargs):
+        """在写线程中执行func并等待结果，写线程内的嵌套调用直接执行"""
+        if threading.get_ident() == self._ident:
+            return func(*args, **kwargs)
+        return self._executor.submit(func, *args, **kwargs).result()
+
 class Db:
     connection_str: str=None
     def __init__(self):
         self._session_factory: Optional[sessionmaker] = None
         self.engine = None
+        self._pool_lock = threading.Lock()
+        self._pool_stats = {"checked_out": 0, "peak_checked_out": 0, "checkouts": 0}
+        self._writer: Optional[SqliteWriter] = None
     def get_engine(self) -> Engine:
         """Return the SQLAlchemy engine for this database connection."""
         if self.engine is None:
@@ -36,7 +79,17 @@ class Db:
                         pass
                     open(db_path, 'w').close()
                     
-            self.engine = create_engine(con_str,pool_size=10, max_overflow=300, pool_recycle=3600, pool_pre_ping=True)
+            # 连接池按实际并发设置，超出pool_size+max_overflow的请求最多等待pool_timeout秒
+            self.engine = create_engine(con_str,
+                pool_size=int(cfg.get("db_pool.size", 10)),
+                max_overflow=int(cfg.get("db_pool.max_overflow", 20)),
+                pool_timeout=int(cfg.get("db_pool.timeout", 30)),
+                pool_recycle=3600, pool_pre_ping=True)
+            self._watch_pool()
+            if self.engine.dialect.name == 'sqlite':
+                self._setup_sqlite()
+            from core.search import Search
+            Search.setup(self.engine)
             Session = sessionmaker(bind=self.engine,expire_on_commit=True)
             self._session = Session()
         except Exception as e:
@@ -59,9 +112,28 @@ class Db:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
             
+    def _setup_sqlite(self) -> None:
+        """SQLite生产模式：WAL日志、busy_timeout、mmap，写操作由单独的线程串行执行"""
+        from sqlalchemy import event
+        event.listen(self.engine, "connect", sqlite_connect_listener())
+        if cfg.get("sqlite.single_writer", True):
+            self._writer = SqliteWriter()
+
+    def write(self, func, *args, **kwargs):
+        """执行写操作，SQLite单写模式下在写线程中串行执行，其他数据库直接执行
+
+        func中执行全部写入SQL并提交；提交前只有查询和属性修改时可以直接传入session.commit
+        """
+        if self._writer is None:
+            return func(*args, **kwargs)
+        return self._writer.submit(func, *args, **kwargs)
+
     def add_article(self, article_data: dict) -> bool:
+        return self.write(self._add_article, article_data)
+
+    def _add_article(self, article_data: dict) -> bool:
+        session=self.get_session()
         try:
-            session=self.get_session()
             from datetime import datetime
             art = Article(**article_data)
             if art.created_at is None:
@@ -70,24 +142,160 @@ class Db:
                 art.updated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             art.created_at=datetime.strptime(art.created_at ,'%Y-%m-%d %H:%M:%S')
             art.updated_at=datetime.strptime(art.updated_at,'%Y-%m-%d %H:%M:%S')
-            art.content=art.content
             from core.models.base import DATA_STATUS
             art.status=DATA_STATUS.ACTIVE
             session.add(art) 
             # self._session.merge(art)
+            from core.search import Search
+            Search.index(session, [art])
             session.commit()
+            from core.known_articles import KnownArticles
+            KnownArticles.add(art.mp_id, [art.id])
+            # 通知RSS缓存该公众号已有新文章
+            from core.rss_cache import RssCache
+            RssCache.invalidate(art.mp_id)
         except Exception as e:
             if "UNIQUE" in str(e) or "Duplicate entry" in str(e):
                 print_warning(f"Article already exists: {art.id}")
             else:
                 print_error(f"Failed to add article: {e}")
+            session.rollback()
             return False
+        finally:
+            session.close()
         return True    
         
+    def _insert_ignore(self, model):
+        """构建忽略主键冲突的INSERT语句，兼容SQLite/MySQL/PostgreSQL"""
+        dialect = self.engine.dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            return insert(model).on_conflict_do_nothing()
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+            return insert(model).on_conflict_do_nothing()
+        from sqlalchemy import insert
+        if dialect in ('mysql', 'mariadb'):
+            return insert(model).prefix_with('IGNORE')
+        return insert(model)
+
+    def _insert_new(self, session, model, rows: List[dict]) -> set:
+        """插入数据并返回实际插入的主键，主键已存在的行被忽略
+
+        新增与否由插入语句本身判断，并发写入同一批数据时每行只会被一方视为新增
+        """
+        stmt = self._insert_ignore(model)
+        if self.engine.dialect.insert_executemany_returning:
+            # SQLite 3.35+/PostgreSQL：冲突的行不会出现在RETURNING结果中
+            return {row[0] for row in session.execute(stmt.returning(model.id), rows)}
+        # MySQL不支持RETURNING，逐行插入按影响行数判断
+        conn = session.connection()
+        return {row['id'] for row in rows if conn.execute(stmt, row).rowcount}
+
+    def add_articles(self, articles_data: List[dict]) -> List[str]:
+        """批量写入文章，已存在的文章跳过
+
+        每批只执行一次查询和一次 INSERT ... ON CONFLICT DO NOTHING RETURNING，
+        新增的文章以实际插入的为准；MySQL不支持RETURNING，逐行 INSERT IGNORE 按影响行数判断
+        Args:
+            articles_data: 文章数据列表，字段同add_article
+        Returns:
+            新增文章的ID列表，写入失败时返回None
+        """
+        if not articles_data:
+            return []
+        from datetime import datetime
+        from core.models.base import DATA_STATUS
+        # 正文单独写入article_contents
+        columns = [key for key in Article.__table__.columns.keys() if key != 'content']
+        now = datetime.now()
+        rows = {}
+        bodies = {}
+        for data in articles_data:
+            row = {key: data.get(key) for key in columns}
+            row['id'] = str(row['id'])
+            for key in ('created_at', 'updated_at'):
+                if row[key] is None:
+                    row[key] = now
+                elif isinstance(row[key], str):
+                    row[key] = datetime.strptime(row[key], '%Y-%m-%d %H:%M:%S')
+            row['status'] = DATA_STATUS.ACTIVE
+            rows[row['id']] = row
+            if data.get('content') is not None:
+                bodies[row['id']] = data['content']
+        return self.write(self._insert_articles, rows, bodies)
+
+    def _insert_articles(self, rows: dict, bodies: dict) -> Optional[List[str]]:
+        session = self.get_session()
+        try:
+            ids = list(rows)
+            existing = {item[0] for item in session.query(Article.id).filter(Article.id.in_(ids))}
+            new_rows = [rows[article_id] for article_id in ids if article_id not in existing]
+            if new_rows:
+                # 查询之后其他采集任务可能已写入同样的文章，以实际插入的为准
+                inserted = self._insert_new(session, Article, new_rows)
+                new_rows = [row for row in new_rows if row['id'] in inserted]
+            if new_rows:
+                contents = []
+                for row in new_rows:
+                    if row['id'] in bodies:
+                        codec, data, size = ArticleContent.compress(bodies[row['id']])
+                        contents.append({"id": row['id'], "codec": codec, "data": data, "size": size})
+                if contents:
+                    session.execute(self._insert_ignore(ArticleContent), contents)
+                from core.search import Search
+                Search.index(session, [dict(row, content=bodies.get(row['id'])) for row in new_rows])
+                session.commit()
+            # 记录已入库的文章，供增量同步判断
+            from core.known_articles import KnownArticles
+            for mp_id in {row['mp_id'] for row in rows.values()}:
+                KnownArticles.add(mp_id, [row['id'] for row in rows.values() if row['mp_id'] == mp_id])
+            if new_rows:
+                # 通知RSS缓存这些公众号已有新文章
+                from core.rss_cache import RssCache
+                for mp_id in {row['mp_id'] for row in new_rows}:
+                    RssCache.invalidate(mp_id)
+            return [row['id'] for row in new_rows]
+        except Exception as e:
+            session.rollback()
+            print_error(f"Failed to add articles: {e}")
+            return None
+        finally:
+            session.close()
+
+    def migrate_article_contents(self, batch: int = 200) -> int:
+        """将articles.content中旧版本内联保存的正文压缩迁移到article_contents
+
+        Returns:
+            迁移的文章数量
+        """
+        total = 0
+        with self.session_scope() as session:
+            while True:
+                articles = session.query(Article).options(undefer(Article.legacy_content))\
+                    .filter(Article.legacy_content != None).limit(batch).all()
+                if not articles:
+                    break
+                for art in articles:
+                    if art.body is None:
+                        art.content = art.legacy_content
+                    else:
+                        # 已经写入过新正文，只清空旧正文
+                        art.legacy_content = None
+                session.commit()
+                total += len(articles)
+        if total:
+            print_info(f"已迁移{total}篇文章正文到article_contents")
+            if self.engine.dialect.name == 'sqlite':
+                # 回收迁移后空出的页，缩小数据库文件
+                with self.engine.connect() as conn:
+                    conn.exec_driver_sql("VACUUM")
+        return total
+
     def get_articles(self, id:str=None, limit:int=30, offset:int=0) -> List[Article]:
         try:
-            data = self.get_session().query(Article).limit(limit).offset(offset)
-            return data
+            with self.session_scope() as session:
+                return session.query(Article).limit(limit).offset(offset).all()
         except Exception as e:
             print(f"Failed to fetch Feed: {e}")
             return e    
@@ -95,7 +303,8 @@ class Db:
     def get_all_mps(self) -> List[Feed]:
         """Get all Feed records"""
         try:
-            return self.get_session().query(Feed).all()
+            with self.session_scope() as session:
+                return session.query(Feed).all()
         except Exception as e:
             print(f"Failed to fetch Feed: {e}")
             return e
@@ -103,16 +312,15 @@ class Db:
     def get_mps_list(self, mp_ids:str) -> List[Feed]:
         try:
             ids=mp_ids.split(',')
-            data =  self.get_session().query(Feed).filter(Feed.id.in_(ids)).all()
-            return data
+            with self.session_scope() as session:
+                return session.query(Feed).filter(Feed.id.in_(ids)).all()
         except Exception as e:
             print(f"Failed to fetch Feed: {e}")
             return e
     def get_mps(self, mp_id:str) -> Optional[Feed]:
         try:
-            ids=mp_id.split(',')
-            data =  self.get_session().query(Feed).filter_by(id= mp_id).first()
-            return data
+            with self.session_scope() as session:
+                return session.query(Feed).filter_by(id= mp_id).first()
         except Exception as e:
             print(f"Failed to fetch Feed: {e}")
             return e
@@ -122,19 +330,161 @@ class Db:
         return data.faker_id
         
     def get_session(self):
-        """获取新的数据库会话"""
+        """获取新的数据库会话，使用完毕后需要调用close()归还连接，建议使用session_scope"""
         if self._session_factory is None:
             self._session_factory = sessionmaker(bind=self.engine, expire_on_commit=False)
         return self._session_factory()
-        
-    def session_dependency(self):
-        """FastAPI依赖项，用于请求范围的会话管理"""
+
+    @contextmanager
+    def session_scope(self) -> Iterator:
+        """会话上下文，退出时关闭会话并归还连接，发生异常时回滚
+
+        用法:
+            with DB.session_scope() as session:
+                session.query(...)
+        """
         session = self.get_session()
         try:
             yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def session_dependency(self):
+        """FastAPI依赖项，用于请求范围的会话管理"""
+        with self.session_scope() as session:
+            yield session
+
+    async def closing_stream(self, session, stream):
+        """流式响应结束(或客户端断开)后关闭生成器和会话
+
+        StreamingResponse在路由函数返回后才读取数据，不能使用请求范围的会话。
+        客户端断开时Starlette只取消当前任务，不会关闭同步生成器，
+        这里在线程池中逐段读取，结束时显式关闭生成器，使其finally中的清理(如删除临时缓存文件)立即执行
+        """
+        import anyio
+        from starlette.concurrency import iterate_in_threadpool
+        try:
+            async for chunk in iterate_in_threadpool(stream):
+                yield chunk
+        finally:
+            # 断开时任务已被取消，需屏蔽取消才能等待清理完成
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(self._close_stream, session, stream)
+
+    @staticmethod
+    def _close_stream(session, stream) -> None:
+        try:
+            stream.close()
         finally:
             session.close()
 
+    def _watch_pool(self) -> None:
+        """监听连接池的借出和归还，用于统计连接使用情况"""
+        from sqlalchemy import event
+        def on_checkout(dbapi_conn, conn_record, conn_proxy):
+            with self._pool_lock:
+                stats = self._pool_stats
+                stats["checked_out"] += 1
+                stats["checkouts"] += 1
+                stats["peak_checked_out"] = max(stats["peak_checked_out"], stats["checked_out"])
+        def on_checkin(dbapi_conn, conn_record):
+            with self._pool_lock:
+                self._pool_stats["checked_out"] = max(0, self._pool_stats["checked_out"] - 1)
+        event.listen(self.engine, "checkout", on_checkout)
+        event.listen(self.engine, "checkin", on_checkin)
+
+    def pool_status(self) -> dict:
+        """连接池使用情况"""
+        pool = self.engine.pool
+        with self._pool_lock:
+            data = dict(self._pool_stats)
+        data["pool"] = type(pool).__name__
+        for name in ("size", "checkedin", "overflow", "timeout"):
+            func = getattr(pool, name, None)
+            if callable(func):
+                data[name] = func()
+        data["max_overflow"] = getattr(pool, "_max_overflow", None)
+        return data
+
 # 全局数据库实例
 DB = Db()
-DB.init(cfg.get("db"))
\ No newline at end of file
+DB.init(cfg.get("db"))
+
+# 同步驱动对应的异步驱动
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+    'mysql': 'mysql+asyncmy',
+    'mysql+pymysql': 'mysql+asyncmy',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+class AsyncDb:
+    """异步数据库访问，供FastAPI路由使用，查询期间不阻塞事件循环
+
+    使用aiosqlite/asyncmy/asyncpg驱动创建异步引擎，查询函数沿用同步写法，
+    通过AsyncSession.run_sync执行。未安装异步驱动时退化为在线程池中使用同步会话执行。
+    """
+
+    def __init__(self, db: Db):
+        self.db = db
+        self.engine = None
+        self._session_factory = None
+
+    def init(self, con_str: str) -> None:
+        from sqlalchemy.engine import make_url
+        url = make_url(con_str)
+        driver = ASYNC_DRIVERS.get(url.drivername)
+        if driver is None:
+            print_warning(f"数据库{url.drivername}没有对应的异步驱动，使用线程池执行查询")
+            return
+        try:
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+            options = {"pool_recycle": 3600, "pool_pre_ping": True}
+            if not driver.startswith('sqlite'):
+                options.update(pool_size=int(cfg.get("db_pool.size", 10)),
+                               max_overflow=int(cfg.get("db_pool.max_overflow", 20)),
+                               pool_timeout=int(cfg.get("db_pool.timeout", 30)))
+            self.engine = create_async_engine(url.set(drivername=driver), **options)
+            if driver.startswith('sqlite'):
+                from sqlalchemy import event
+                event.listen(self.engine.sync_engine, "connect", sqlite_connect_listener())
+            self._session_factory = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        except ImportError as e:
+            print_warning(f"未安装异步数据库驱动({e})，使用线程池执行查询")
+            self.engine = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine is not None
+
+    async def run(self, func, *args, **kwargs):
+        """在会话中执行查询函数func(session, *args, **kwargs)并返回结果"""
+        if self._session_factory is None:
+            from starlette.concurrency import run_in_threadpool
+            def call():
+                with self.db.session_scope() as session:
+                    return func(session, *args, **kwargs)
+            return await run_in_threadpool(call)
+        async with self._session_factory() as session:
+            return await session.run_sync(func, *args, **kwargs)
+
+    async def close(self) -> None:
+        """关闭异步引擎的全部连接，应用退出时调用"""
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    async def session_dependency(self):
+        """FastAPI依赖项，提供请求范围的AsyncSession，需要安装异步驱动"""
+        if self._session_factory is None:
+            raise RuntimeError("未安装异步数据库驱动")
+        async with self._session_factory() as session:
+            yield session
+
+# 全局异步数据库实例
+ADB = AsyncDb(DB)
+ADB.init(cfg.get("db"))
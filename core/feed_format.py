@@ -0,0 +1,178 @@
+from xml.sax.saxutils import escape, quoteattr
+from datetime import datetime
+from urllib.parse import quote, urlparse
+import json
+
+# Atom的id必须是绝对IRI，链接不是绝对地址时使用该前缀生成URN
+URN_PREFIX = "urn:we-mp-rss:"
+
+class FeedSerializer:
+    """订阅源序列化基类
+
+    生成过程分为head、item、tail三段，每段返回一个字符串片段，
+    由RSS.generate_rss_stream逐段写入缓存并流式输出。
+    """
+    name = ""
+    # 缓存文件扩展名
+    ext = ""
+    media_type = ""
+
+    def __init__(self, full_context: bool = False, use_cdata: bool = False):
+        self.full_context = full_context
+        self.use_cdata = use_cdata
+
+    def head(self, title: str, link: str, description: str, language: str, build_time: datetime, feed_id: str = None) -> str:
+        """
+        :param feed_id: 订阅源标识(公众号ID、all或聚合源名称)
+        """
+        raise NotImplementedError
+
+    def item(self, rss_item: dict, updated: datetime, index: int) -> str:
+        """
+        :param rss_item: 条目数据，包含id、title、description、link、content
+        :param updated: 条目发布时间
+        :param index: 条目序号，从0开始
+        """
+        raise NotImplementedError
+
+    def tail(self) -> str:
+        raise NotImplementedError
+
+    def _element(self, tag: str, text) -> str:
+        if text is None:
+            return f"<{tag}></{tag}>"
+        return f"<{tag}>{escape(str(text))}</{tag}>"
+
+    def _cdata(self, text: str) -> str:
+        """使用CDATA包裹内容，内容中的]]>需要拆分到两个CDATA段中"""
+        return "<![CDATA[" + text.replace("]]>", "]]]]><![CDATA[>") + "]]>"
+
+class RssSerializer(FeedSerializer):
+    """RSS 2.0"""
+    name = "rss"
+    ext = "xml"
+    media_type = "application/xml"
+
+    def head(self, title, link, description, language, build_time, feed_id=None):
+        rss_attrs = ' version="2.0"'
+        if self.full_context:
+            rss_attrs += ' xmlns:content="http://purl.org/rss/1.0/modules/content/"'
+        return '<?xml version="1.0" encoding="utf-8"?>\r\n' + \
+            f'<rss{rss_attrs}><channel>' + \
+            self._element("title", title) + \
+            self._element("link", link) + \
+            self._element("description", description) + \
+            self._element("language", language) + \
+            self._element("generator", "Mp-We-Rss") + \
+            self._element("lastBuildDate", build_time.strftime("%a, %d %b %Y %H:%M:%S %z"))
+
+    def item(self, rss_item, updated, index):
+        parts = ["<item>",
+            self._element("id", rss_item["id"]),
+            self._element("title", rss_item["title"]),
+            self._element("description", rss_item["description"]),
+            self._element("guid", rss_item["link"])]
+        if self.full_context:
+            try:
+                content = str(rss_item['content'])
+                if self.use_cdata:
+                    parts.append(f"<content:encoded>{self._cdata(content)}</content:encoded>")
+                else:
+                    parts.append(self._element("content:encoded", content))
+            except Exception as e:
+                print(f"Error adding content:encoded element: {e}")
+        parts.append(self._element("link", rss_item["link"]))
+        parts.append(self._element("pubDate", updated.strftime('%a, %d %b %Y %H:%M:%S %z')))
+        parts.append("</item>")
+        return "".join(parts)
+
+    def tail(self):
+        return "</channel></rss>"
+
+class AtomSerializer(FeedSerializer):
+    """Atom 1.0 (RFC 4287)"""
+    name = "atom"
+    ext = "atom"
+    media_type = "application/atom+xml"
+
+    @staticmethod
+    def _absolute(link) -> bool:
+        return bool(link) and bool(urlparse(str(link)).scheme)
+
+    def head(self, title, link, description, language, build_time, feed_id=None):
+        if feed_id:
+            feed_iri = f"{URN_PREFIX}feed:{quote(str(feed_id))}"
+        elif self._absolute(link):
+            feed_iri = str(link)
+        else:
+            feed_iri = f"{URN_PREFIX}feed:{quote(str(title))}"
+        return '<?xml version="1.0" encoding="utf-8"?>\r\n' + \
+            f'<feed xmlns="http://www.w3.org/2005/Atom" xml:lang={quoteattr(str(language))}>' + \
+            self._element("title", title) + \
+            self._element("subtitle", description) + \
+            (f'<link href={quoteattr(str(link))}/>' if link else "") + \
+            self._element("id", feed_iri) + \
+            self._element("updated", build_time.astimezone().isoformat()) + \
+            self._element("generator", "Mp-We-Rss")
+
+    def item(self, rss_item, updated, index):
+        link = rss_item["link"]
+        entry_iri = str(link) if self._absolute(link) else f"{URN_PREFIX}article:{quote(str(rss_item['id']))}"
+        parts = ["<entry>",
+            self._element("id", entry_iri),
+            self._element("title", rss_item["title"]),
+            f'<link href={quoteattr(str(rss_item["link"]))}/>',
+            self._element("published", updated.astimezone().isoformat()),
+            self._element("updated", updated.astimezone().isoformat()),
+            self._element("summary", rss_item["description"])]
+        if self.full_context:
+            try:
+                parts.append(f'<content type="html">{escape(str(rss_item["content"]))}</content>')
+            except Exception as e:
+                print(f"Error adding content element: {e}")
+        parts.append("</entry>")
+        return "".join(parts)
+
+    def tail(self):
+        return "</feed>"
+
+class JsonFeedSerializer(FeedSerializer):
+    """JSON Feed 1.1"""
+    name = "json"
+    ext = "json"
+    media_type = "application/feed+json"
+
+    def head(self, title, link, description, language, build_time, feed_id=None):
+        head = json.dumps({
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": title,
+            "home_page_url": str(link),
+            "description": description,
+            "language": language,
+        }, ensure_ascii=False)
+        # 去掉结尾的}，后面继续输出items
+        return head[:-1] + ',"items":['
+
+    def item(self, rss_item, updated, index):
+        item = {
+            "id": str(rss_item["id"]),
+            "url": rss_item["link"],
+            "title": rss_item["title"],
+            "summary": rss_item["description"],
+            "date_published": updated.astimezone().isoformat(),
+        }
+        if self.full_context:
+            item["content_html"] = str(rss_item.get("content") or "")
+        else:
+            item["content_text"] = rss_item["description"] or ""
+        chunk = json.dumps(item, ensure_ascii=False)
+        return chunk if index == 0 else "," + chunk
+
+    def tail(self):
+        return "]}"
+
+FEED_FORMATS = {
+    RssSerializer.name: RssSerializer,
+    AtomSerializer.name: AtomSerializer,
+    JsonFeedSerializer.name: JsonFeedSerializer,
+}
@@ -0,0 +1,43 @@
+import threading
+
+# 公众号不存在时显示的名称
+UNKNOWN_FEED_NAME = "未知公众号"
+
+class FeedNameCache:
+    """公众号名称缓存
+
+    进程内缓存公众号ID到名称的映射，文章列表只需一次IN查询补齐缺失的公众号名称，
+    公众号添加、更新或删除时调用invalidate使缓存失效。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = {}
+
+    def get(self, session, mp_ids) -> dict:
+        """
+        获取公众号名称
+        :param mp_ids: 公众号ID，可以重复或为空
+        :return: 公众号ID到名称的映射，不存在的公众号使用UNKNOWN_FEED_NAME
+        """
+        ids = {mp_id for mp_id in mp_ids if mp_id}
+        with self._lock:
+            names = {mp_id: self._names[mp_id] for mp_id in ids if mp_id in self._names}
+        missing = ids - names.keys()
+        if missing:
+            from core.models.feed import Feed
+            found = dict(session.query(Feed.id, Feed.mp_name).filter(Feed.id.in_(missing)).all())
+            with self._lock:
+                self._names.update(found)
+            names.update(found)
+        return {mp_id: names.get(mp_id, UNKNOWN_FEED_NAME) for mp_id in ids}
+
+    def invalidate(self, mp_id: str = None) -> None:
+        """使缓存失效，mp_id为空时清空全部缓存"""
+        with self._lock:
+            if mp_id is None:
+                self._names.clear()
+            else:
+                self._names.pop(mp_id, None)
+
+FeedNames = FeedNameCache()
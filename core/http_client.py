@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from http.cookiejar import DefaultCookiePolicy
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from core.config import cfg
+
+# 单独设置连接池大小的域名
+WECHAT_HOST = "mp.weixin.qq.com"
+# 服务端错误时重试
+RETRY_STATUS = (500, 502, 503, 504)
+
+class PooledSession(requests.Session):
+    """未指定timeout的请求使用默认超时"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.default_timeout = timeout
+        # 不保存响应中的Cookie，共用会话的请求之间互不影响
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.default_timeout
+        return super().request(method, url, **kwargs)
+
+class HttpClient:
+    """进程内共用的HTTP客户端
+
+    同步请求共用一个requests会话，按域名保持长连接池，设置默认超时，
+    GET等幂等请求在连接失败或服务端错误时按指数退避重试，避免每次请求重新握手TLS。
+    异步请求按事件循环共用一个httpx.AsyncClient。
+    参数在http配置中设置。
+    """
+
+    def __init__(self):
+        self._session = None
+        self._async_clients = {}
+        self._lock = threading.Lock()
+
+    def timeout(self) -> tuple:
+        """(连接超时, 读取超时)秒"""
+        return (float(cfg.get("http.connect_timeout", 5)), float(cfg.get("http.timeout", 10)))
+
+    def _retry(self) -> Retry:
+        retries = int(cfg.get("http.retries", 2))
+        return Retry(total=retries, connect=retries, read=retries, status=retries,
+                     backoff_factor=float(cfg.get("http.backoff", 0.5)),
+                     status_forcelist=RETRY_STATUS, raise_on_status=False)
+
+    def _adapter(self, maxsize: int) -> HTTPAdapter:
+        return HTTPAdapter(pool_connections=int(cfg.get("http.pool_connections", 10)),
+                           pool_maxsize=maxsize, max_retries=self._retry())
+
+    @property
+    def session(self) -> requests.Session:
+        """共用的requests会话，可在多个线程中同时使用"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = PooledSession(self.timeout())
+                    adapter = self._adapter(int(cfg.get("http.pool_maxsize", 10)))
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    # 采集请求集中在公众号平台，单独使用更大的连接池
+                    session.mount(f"https://{WECHAT_HOST}/",
+                                  self._adapter(int(cfg.get("http.wechat_pool_maxsize", 20))))
+                    self._session = session
+        return self._session
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.session.post(url, **kwargs)
+
+    def new_async_client(self, max_connections: int = None, **kwargs) -> httpx.AsyncClient:
+        """创建使用默认超时、连接池大小和连接重试的httpx.AsyncClient，由调用方负责关闭"""
+        connect, read = self.timeout()
+        max_connections = max_connections or int(cfg.get("http.pool_maxsize", 10))
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        transport = httpx.AsyncHTTPTransport(retries=int(cfg.get("http.retries", 2)), limits=limits,
+                                             verify=kwargs.pop("verify", True))
+        return httpx.AsyncClient(timeout=httpx.Timeout(read, connect=connect), transport=transport, **kwargs)
+
+    def async_client(self) -> httpx.AsyncClient:
+        """当前事件循环共用的httpx.AsyncClient"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None or client.is_closed:
+                client = self._async_clients[loop] = self.new_async_client()
+            return client
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环的异步客户端"""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self) -> None:
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+Http = HttpClient()
@@ -0,0 +1,50 @@
+import threading
+
+class KnownArticleCache:
+    """已采集文章ID缓存，用于增量同步
+
+    按公众号缓存已入库的文章ID，采集时整页批量判断哪些文章已存在：
+    先查缓存，未命中的ID只执行一次IN查询，查到后加入缓存。
+    每个公众号最多缓存max_size个ID，超过后清空重新累积。
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._ids = {}
+
+    def known(self, mp_id: str, ids) -> set:
+        """
+        返回已入库的文章ID
+        :param ids: 本页文章ID
+        """
+        ids = {str(article_id) for article_id in ids if article_id}
+        with self._lock:
+            cached = self._ids.get(mp_id, set())
+            found = ids & cached
+        missing = ids - found
+        if missing:
+            from core.db import DB
+            from core.models.article import Article
+            with DB.session_scope() as session:
+                exists = {row[0] for row in session.query(Article.id).filter(Article.id.in_(missing))}
+            self.add(mp_id, exists)
+            found |= exists
+        return found
+
+    def add(self, mp_id: str, ids) -> None:
+        """记录新入库的文章ID"""
+        if not ids:
+            return
+        with self._lock:
+            cached = self._ids.setdefault(mp_id, set())
+            if len(cached) + len(ids) > self.max_size:
+                cached.clear()
+            cached.update(str(article_id) for article_id in ids)
+
+    def discard(self, mp_id: str, article_id: str) -> None:
+        """文章从数据库删除后移除缓存"""
+        with self._lock:
+            self._ids.get(mp_id, set()).discard(str(article_id))
+
+KnownArticles = KnownArticleCache()
@@ -1,5 +1,11 @@
 # 导入文章模型
 from .article import Article 
+# 导入文章正文模型
+from .article_content import ArticleContent
+# 导入历史回填任务模型
+from .backfill_job import BackfillJob
+# 导入采集断点模型
+from .gather_checkpoint import GatherCheckpoint
 # 导入订阅源模型
 from .feed import Feed
 # 导入用户模型
@@ -1,12 +1,25 @@
-from  .base import Base,Column,String,Integer,DateTime,Text,MEDIUMTEXT
+from  .base import Base,Column,String,Integer,DateTime,Text,MEDIUMTEXT,Index
+from sqlalchemy import inspect
+from sqlalchemy.orm import relationship, deferred
+from .article_content import ArticleContent
 class Article(Base):
     __tablename__ = 'articles'
+    __table_args__ = (
+        # 公众号文章列表/RSS：按公众号过滤并按发布时间倒序
+        Index('idx_articles_mp_id_publish_time', 'mp_id', 'publish_time'),
+        # 文章列表：按状态过滤并按发布时间倒序
+        Index('idx_articles_status_publish_time', 'status', 'publish_time'),
+    )
     id = Column(String(255), primary_key=True)
     mp_id = Column(String(255))
     title = Column(String(500))
     pic_url = Column(String(500))
     url=Column(String(500))
-    content = Column(Text)
+    # 旧版本内联保存的正文，启动时迁移到article_contents后置空
+    legacy_content = deferred(Column('content', Text))
+    # 正文单独存表，访问content时才加载
+    body = relationship(ArticleContent, primaryjoin='foreign(ArticleContent.id) == Article.id',
+                        uselist=False, lazy='select', cascade='all, delete-orphan')
     description=Column(String(800))
     status = Column(Integer,default=1)
     publish_time = Column(Integer)
@@ -14,4 +27,20 @@ class Article(Base):
     updated_at = Column(DateTime)  
     is_export = Column(Integer)
 
+    @property
+    def content(self):
+        if self.body is not None:
+            return self.body.text
+        return self.legacy_content
 
+    @content.setter
+    def content(self, value):
+        if value is None:
+            self.body = None
+        elif self.body is not None:
+            self.body.text = value
+        else:
+            self.body = ArticleContent.from_text(self.id, value)
+        # 只在旧正文已加载时清空，不为此单独查询一次，未加载的由迁移清空
+        if 'legacy_content' not in inspect(self).unloaded and self.legacy_content is not None:
+            self.legacy_content = None
@@ -0,0 +1,52 @@
+import zlib
+from .base import Base, Column, String, Integer
+from sqlalchemy import LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class ArticleContent(Base):
+    """文章正文，与文章元数据分表压缩存储，列表查询不会读取正文"""
+    __tablename__ = 'article_contents'
+    id = Column(String(255), primary_key=True)
+    # 压缩算法：zstd或zlib
+    codec = Column(String(16))
+    data = Column(LargeBinary().with_variant(LONGBLOB(), 'mysql'))
+    # 压缩前的字节数
+    size = Column(Integer)
+
+    @staticmethod
+    def compress(text: str):
+        """压缩正文，安装zstandard时使用zstd，否则使用zlib
+        :return: (压缩算法, 压缩后的数据, 压缩前的字节数)
+        """
+        raw = text.encode('utf-8')
+        if zstandard is not None:
+            return 'zstd', zstandard.ZstdCompressor(level=3).compress(raw), len(raw)
+        return 'zlib', zlib.compress(raw, 6), len(raw)
+
+    @staticmethod
+    def decompress(codec: str, data: bytes) -> str:
+        if data is None:
+            return None
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("正文使用zstd压缩，需要安装zstandard")
+            return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+        return zlib.decompress(data).decode('utf-8')
+
+    @classmethod
+    def from_text(cls, article_id: str, text: str) -> 'ArticleContent':
+        item = cls(id=article_id)
+        item.text = text
+        return item
+
+    @property
+    def text(self) -> str:
+        return self.decompress(self.codec, self.data)
+
+    @text.setter
+    def text(self, value: str) -> None:
+        self.codec, self.data, self.size = self.compress(value)
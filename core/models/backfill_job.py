@@ -0,0 +1,18 @@
+from .base import Base, Column, String, Integer, DateTime, Text
+
+class BackfillJob(Base):
+    """公众号历史文章回填任务"""
+    __tablename__ = 'backfill_jobs'
+    mp_id = Column(String(255), primary_key=True)
+    # 运行中PENDING、暂停INACTIVE、完成COMPLETED、出错FAILED
+    status = Column(Integer)
+    # 下一页的起始位置(begin参数)
+    page_begin = Column(Integer, default=0)
+    # 每页文章(发布)数
+    page_size = Column(Integer, default=5)
+    # 接口返回的文章(发布)总数，用于估算总页数
+    total_count = Column(Integer)
+    # 最近一次出错的原因
+    message = Column(Text)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
@@ -0,0 +1,15 @@
+from .base import Base, Column, String, Integer, DateTime
+
+class GatherCheckpoint(Base):
+    """公众号采集断点，采集中断后下次从断点继续翻页"""
+    __tablename__ = 'gather_checkpoints'
+    mp_id = Column(String(255), primary_key=True)
+    # 下一页的起始位置(begin参数)
+    page_begin = Column(Integer, default=0)
+    # 本次采集的结束位置，不包含
+    page_end = Column(Integer, default=0)
+    # 最后一页最后一篇文章的ID
+    last_aid = Column(String(255))
+    # 采集中PENDING、完成COMPLETED、出错FAILED
+    status = Column(Integer)
+    updated_at = Column(DateTime)
@@ -1,4 +1,4 @@
-import requests
+from core.http_client import Http
 import json
 def send_dingtalk_message(webhook_url, title, text, is_at_all=False, at_mobiles=[]):
     """
@@ -24,7 +24,7 @@ def send_dingtalk_message(webhook_url, title, text, is_at_all=False, at_mobiles=
         }
     }
     try:
-        response = requests.post(
+        response = Http.post(
             url=webhook_url,
             headers=headers,
             data=json.dumps(data)
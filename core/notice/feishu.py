@@ -1,4 +1,4 @@
-import requests
+from core.http_client import Http
 import json
 
 def send_feishu_message(webhook_url, title, text):
@@ -37,7 +37,7 @@ def send_feishu_message(webhook_url, title, text):
         }
     }
     try:
-        response = requests.post(
+        response = Http.post(
             url=webhook_url,
             headers=headers,
             data=json.dumps(data)
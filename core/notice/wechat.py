@@ -1,4 +1,4 @@
-import requests
+from core.http_client import Http
 import json
 
 
@@ -21,7 +21,7 @@ def send_wechat_message(webhook_url, title, text):
         }
     }
     try:
-        response = requests.post(
+        response = Http.post(
             url=webhook_url,
             headers=headers,
             data=json.dumps(data)
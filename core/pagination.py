@@ -0,0 +1,100 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+def _load(value):
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+def encode_cursor(*values) -> str:
+    """将排序键编码为不透明的游标字符串"""
+    data = json.dumps([_dump(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    """解析游标字符串，游标无效时抛出ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, list):
+        raise ValueError("无效的分页游标")
+    return [_load(v) for v in values]
+
+def keyset_filter(query, order_col, id_col, cursor: str = None):
+    """
+    为查询添加游标条件并按(order_col, id_col)倒序排列
+    :param order_col: 排序列，如Article.publish_time
+    :param id_col: 唯一列，用于排序值相同时确定顺序
+    :param cursor: 上一页返回的游标，为空时从第一页开始
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2:
+            raise ValueError("无效的分页游标")
+        value, last_id = values
+        query = query.filter(or_(order_col < value, and_(order_col == value, id_col < last_id)))
+    return query.order_by(order_col.desc(), id_col.desc())
+
+def keyset_page(query, order_col, id_col, cursor: str = None, limit: int = 10):
+    """
+    游标分页，翻到任意深度的代价与第一页相同
+    :return: (当前页数据, 下一页游标)，没有下一页时游标为None
+    """
+    rows = keyset_filter(query, order_col, id_col, cursor).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, order_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
+
+def page_end_cursor(query, order_col, id_col, cursor: str = None, limit: int = 10):
+    """
+    只查询排序键，计算当前页之后的游标，适用于需要先返回下一页地址再流式输出数据的场景
+    :return: 下一页游标，没有下一页时返回None
+    """
+    rows = keyset_filter(query.with_entities(order_col, id_col), order_col, id_col, cursor)\
+        .offset(limit - 1).limit(2).all()
+    if len(rows) < 2:
+        return None
+    return encode_cursor(rows[0][0], rows[0][1])
+
+class CountCache:
+    """查询总数缓存，相同条件的count在ttl秒内只执行一次"""
+
+    def __init__(self, ttl: float = 30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def count(self, key, query) -> int:
+        """
+        :param key: 缓存键，需包含所有过滤条件
+        :param query: 未分页的查询
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._data.get(key)
+            if cached is not None and now - cached[0] < self.ttl:
+                return cached[1]
+        total = query.order_by(None).count()
+        with self._lock:
+            self._data[key] = (now, total)
+        return total
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+TotalCache = CountCache()
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+from core.config import cfg
+from core.print import print_warning
+
+# 微信接口名称
+APPMSG = "appmsg"
+APPMSG_PUBLISH = "appmsgpublish"
+SEARCH_BIZ = "searchbiz"
+ARTICLE = "article"
+
+# 流量控制错误码
+FREQ_CONTROL = 200013
+
+class TokenBucket:
+    """令牌桶，按rate(次/秒)补充令牌，最多累积burst个
+
+    速率按AIMD调整：请求成功后加性增加，触发流量控制后乘性减少并冷却一段时间。
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float, max_rate: float,
+                 increase: float, decrease: float, cooldown: float):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.tokens = burst
+        self.updated = time.monotonic()
+        # 冷却结束时间，冷却期间不发放令牌
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        start = max(self.updated, self.blocked_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """预定一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(0.0, self.blocked_until - now)
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+            return wait
+
+    def blocked(self) -> float:
+        """剩余的冷却秒数"""
+        with self._lock:
+            return max(0.0, self.blocked_until - time.monotonic())
+
+    def success(self) -> None:
+        with self._lock:
+            self.throttled = 0
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttle(self) -> float:
+        """触发流量控制，降低速率并冷却，返回冷却秒数"""
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            now = time.monotonic()
+            self._refill(now)
+            # 冷却时间随连续触发次数翻倍
+            cooldown = self.cooldown * (2 ** min(self.throttled - 1, 5))
+            self.blocked_until = max(self.blocked_until, now + cooldown)
+            self.tokens = min(self.tokens, 0)
+            return cooldown
+
+    def block(self, seconds: float) -> None:
+        """冷却指定秒数，不调整速率"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = min(self.tokens, 0)
+
+    def status(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "rate": round(self.rate, 4),
+                "tokens": round(self.tokens, 2),
+                "burst": self.burst,
+                "cooldown": round(max(0.0, self.blocked_until - now), 2),
+                "throttled": self.throttled,
+            }
+
+class RateLimiter:
+    """微信接口限流
+
+    每个接口和登录token的组合使用一个令牌桶，所有采集器和公众号搜索共用，
+    文章列表接口再按公众号(scope)分别使用令牌桶控制单个公众号的请求间隔，
+    请求需同时从token的令牌桶和公众号的令牌桶取得令牌，token的总请求速率不随公众号数量增加。
+    请求前调用acquire/acquire_async取得令牌，请求后调用report上报结果，
+    收到流量控制(200013)时自动降速并冷却，之后逐步恢复速率；
+    速率调整和冷却只作用于token的令牌桶，同一token的所有公众号(包括之后才开始采集的)一起降速和冷却。
+    参数在rate_limit配置中设置，可按接口在rate_limit.endpoints下覆盖。
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _option(self, endpoint: str, key: str, default: float) -> float:
+        value = cfg.get(f"rate_limit.endpoints.{endpoint}.{key}", None)
+        if value is None or value == "":
+            value = cfg.get(f"rate_limit.{key}", default)
+        return float(value)
+
+    def bucket(self, endpoint: str, token: str = "", scope: str = "") -> TokenBucket:
+        """
+        :param scope: 列表接口传入公众号fakeid，按公众号分别限速，为空时返回token的令牌桶
+        """
+        key = (endpoint, token or "", scope or "")
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate = self._option(endpoint, "rate", 0.5)
+                bucket = TokenBucket(
+                    rate=rate,
+                    burst=self._option(endpoint, "burst", 3),
+                    min_rate=self._option(endpoint, "min_rate", 0.02),
+                    max_rate=self._option(endpoint, "max_rate", max(rate, 2)),
+                    increase=self._option(endpoint, "increase", 0.02),
+                    decrease=self._option(endpoint, "decrease", 0.5),
+                    cooldown=self._option(endpoint, "cooldown", 30),
+                )
+                self._buckets[key] = bucket
+            return bucket
+
+    def _chain(self, endpoint: str, token: str, scope: str) -> list:
+        """请求需要取得令牌的令牌桶：token的令牌桶，以及公众号的令牌桶"""
+        buckets = [self.bucket(endpoint, token)]
+        if scope:
+            buckets.append(self.bucket(endpoint, token, scope))
+        return buckets
+
+    def acquire(self, endpoint: str, token: str = "", scope: str = "") -> float:
+        """阻塞直到取得令牌，返回等待的秒数，不要在事件循环中调用，异步代码使用acquire_async"""
+        buckets = self._chain(endpoint, token, scope)
+        total = wait = max([bucket.reserve() for bucket in buckets])
+        # 等待期间其他请求触发流量控制时，继续等到冷却结束
+        while wait > 0:
+            time.sleep(wait)
+            wait = max(bucket.blocked() for bucket in buckets)
+            total += wait
+        return total
+
+    async def acquire_async(self, endpoint: str, token: str = "", scope: str = "") -> float:
+        """异步等待直到取得令牌，返回等待的秒数"""
+        buckets = self._chain(endpoint, token, scope)
+        total = wait = max([bucket.reserve() for bucket in buckets])
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = max(bucket.blocked() for bucket in buckets)
+            total += wait
+        return total
+
+    def report(self, endpoint: str, token: str = "", ret: int = 0, scope: str = "") -> float:
+        """
+        上报请求结果，速率调整和冷却作用于token的令牌桶，同一token的所有公众号共享
+        :param ret: 接口返回的base_resp.ret
+        :return: 触发流量控制时返回冷却秒数，否则返回0
+        """
+        bucket = self.bucket(endpoint, token)
+        if ret == FREQ_CONTROL:
+            cooldown = bucket.throttle()
+            print_warning(f"接口[{endpoint}]触发流量控制，速率降至{bucket.rate:.3f}次/秒，冷却{cooldown:g}秒")
+            return cooldown
+        if ret == 0:
+            bucket.success()
+        return 0
+
+    def status(self) -> list:
+        """当前各令牌桶的速率和令牌数量，token只显示末尾4位"""
+        with self._lock:
+            items = list(self._buckets.items())
+        return [
+            dict(endpoint=endpoint, token=f"***{token[-4:]}" if token else "", scope=scope, **bucket.status())
+            for (endpoint, token, scope), bucket in items
+        ]
+
+    def reset(self) -> None:
+        """清空所有令牌桶，配置修改后重新按配置创建"""
+        with self._lock:
+            self._buckets.clear()
+
+RateLimit = RateLimiter()
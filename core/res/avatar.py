@@ -3,7 +3,7 @@ from core.config import cfg
 import os
 import uuid
 import os
-import requests
+from core.http_client import Http
 from urllib.parse import urlparse
 def save_avatar_locally(avatar_url):
     if not cfg.get("local_avatar",False):
@@ -24,7 +24,7 @@ def save_avatar_locally(avatar_url):
     
     # 下载并保存文件
     try:
-        response = requests.get(avatar_url)
+        response = Http.get(avatar_url)
         response.raise_for_status()
         with open(file_path, "wb") as f:
             f.write(response.content)
@@ -1,26 +1,171 @@
-import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
+from typing import Iterable
 import os
 import json
+import uuid
+import hashlib
+import re
+import gzip
+from core.feed_format import FEED_FORMATS
+from email.utils import formatdate
+try:
+    import brotli
+except ImportError:
+    brotli = None
+CHUNK_SIZE=64*1024
+# 预压缩缓存的编码及文件后缀，按优先级排列
+ENCODINGS={"br":".br","gzip":".gz"}
+# 缓存文件元信息，按缓存文件的mtime失效，避免每次请求都读取meta文件
+_meta_cache={}
+class CacheWriter:
+    """缓存文件写入器
+
+    写入缓存文件的同时生成预压缩的gzip/brotli版本，全部写入临时文件，
+    commit时原子替换正式文件，abort时删除临时文件。
+    """
+    def __init__(self, path: str, precompress: bool = True):
+        self.path = path
+        # 线程池的线程会被复用，同一订阅源的并发请求可能落在同一线程，临时文件名需全局唯一
+        self._suffix = f".{uuid.uuid4().hex}.tmp"
+        # (正式文件, 临时文件, 文件对象, brotli压缩器)
+        self._files = []
+        self._closed = False
+        self._add(path, open(path + self._suffix, "wb"))
+        if precompress:
+            gz_path = path + ENCODINGS["gzip"]
+            self._add(gz_path, gzip.GzipFile(gz_path + self._suffix, mode="wb", mtime=0))
+            if brotli is not None:
+                br_path = path + ENCODINGS["br"]
+                self._add(br_path, open(br_path + self._suffix, "wb"), brotli.Compressor(mode=brotli.MODE_TEXT))
+
+    def _add(self, path: str, f, compressor=None):
+        self._files.append((path, path + self._suffix, f, compressor))
+
+    def write(self, chunk: str) -> None:
+        data = chunk.encode("utf-8")
+        for path, tmp_path, f, compressor in self._files:
+            f.write(compressor.process(data) if compressor is not None else data)
+
+    def _close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for path, tmp_path, f, compressor in self._files:
+            if compressor is not None:
+                f.write(compressor.finish())
+            f.close()
+
+    def commit(self) -> None:
+        """完成写入，先替换压缩版本，最后替换原文件"""
+        self._close()
+        for path, tmp_path, f, compressor in reversed(self._files):
+            os.replace(tmp_path, path)
+
+    def abort(self) -> None:
+        """放弃写入，删除临时文件"""
+        try:
+            self._close()
+        except Exception:
+            pass
+        for path, tmp_path, f, compressor in self._files:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
 class RSS:
     cache_dir = os.path.normpath("static/cache/rss")
     content_cache_dir = os.path.normpath("static/cache/content")
     rss_file="all"
     
-    def __init__(self, name:str="all",cache_dir: str = None):
+    def __init__(self, name:str="all",cache_dir: str = None,feed_format:str="rss",cache:bool=True):
         if cache_dir is not None:
             self.cache_dir = cache_dir
+        if feed_format not in FEED_FORMATS:
+            raise ValueError(f"Unsupported feed format: {feed_format}")
+        self.feed_format = feed_format
+        self.serializer_class = FEED_FORMATS[feed_format]
+        self.media_type = self.serializer_class.media_type
       
         os.makedirs(self.cache_dir, exist_ok=True)
         os.makedirs(self.content_cache_dir, exist_ok=True)
-        normalized_path = os.path.normpath(f"{self.cache_dir}/{name}.xml")
+        normalized_path = os.path.normpath(f"{self.cache_dir}/{name}.{self.serializer_class.ext}")
         if not normalized_path.startswith(self.cache_dir):
             raise ValueError("Invalid file path: Path traversal detected.")
         self.rss_file = normalized_path
+        self.meta_file = f"{normalized_path}.meta"
+        if not cache:
+            # 不读写缓存，只流式生成
+            self.rss_file = None
         pass
 
-    def cache_content(self, content_id: str, content: dict):
-        """缓存文章内容"""
+    @classmethod
+    def list_caches(cls, name: str, cache_dir: str = None) -> list:
+        """列出某个源已生成的分页缓存
+
+        Args:
+            name: 源名称，公众号ID或all
+            cache_dir: 缓存目录，默认使用类的cache_dir
+
+        Returns:
+            (limit, offset, feed_format)元组列表
+        """
+        cache_dir = cache_dir or cls.cache_dir
+        formats = {serializer.ext: feed_format for feed_format, serializer in FEED_FORMATS.items()}
+        ext_pattern = "|".join(re.escape(ext) for ext in formats)
+        pattern = re.compile(rf"^{re.escape(name)}_(\d+)_(\d+)\.({ext_pattern})$")
+        pages = []
+        try:
+            files = os.listdir(cache_dir)
+        except FileNotFoundError:
+            return pages
+        for file in files:
+            match = pattern.match(file)
+            if match:
+                pages.append((int(match.group(1)), int(match.group(2)), formats[match.group(3)]))
+        return pages
+
+    @classmethod
+    def list_cache_names(cls, prefix: str, cache_dir: str = None) -> set:
+        """列出以prefix开头的源名称(不含分页及扩展名)"""
+        cache_dir = cache_dir or cls.cache_dir
+        exts = "|".join(re.escape(serializer.ext) for serializer in FEED_FORMATS.values())
+        pattern = re.compile(rf"^({re.escape(prefix)}[^.]*)_\d+_\d+\.({exts})$")
+        try:
+            files = os.listdir(cache_dir)
+        except FileNotFoundError:
+            return set()
+        return {match.group(1) for match in map(pattern.match, files) if match}
+
+    def _content_store(self):
+        """返回文章内容存储，配置rss.content_store为file时使用每篇文章一个JSON文件的旧方式"""
+        from core.config import cfg
+        if cfg.get("rss.content_store","db")=="file":
+            return None
+        from core.content_store import get_content_store
+        return get_content_store(f"{self.content_cache_dir}.db")
+
+    def content_fingerprint(self, content: dict) -> str:
+        """计算文章原始内容的指纹，用于判断缓存是否需要更新"""
+        h=hashlib.md5()
+        for key in sorted(content):
+            h.update(f"{key}\0{content[key]}\0".encode("utf-8"))
+        return h.hexdigest()
+
+    def cache_content(self, content_id: str, content: dict) -> bool:
+        """缓存文章内容
+
+        使用内容存储时，原始内容与上次缓存时相同则直接跳过，不再处理图片地址和写入
+        Returns:
+            是否写入了缓存
+        """
+        store=self._content_store()
+        if store is not None:
+            source=self.content_fingerprint(content)
+            if store.fingerprint(str(content_id))==source:
+                return False
+            content["content"]=self.add_logo_prefix_to_urls(content["content"])
+            return store.put(str(content_id), content, source=source)
         content["content"]=self.add_logo_prefix_to_urls(content["content"])
         content_path = os.path.normpath(f"{self.content_cache_dir}/{content_id}.json")
         if not content_path.startswith(self.content_cache_dir):
@@ -28,9 +173,15 @@ class RSS:
         
         with open(content_path, "w", encoding="utf-8") as f:
             json.dump(content, f, ensure_ascii=False, indent=2)
+        return True
 
     def get_cached_content(self, content_id: str) -> dict:
-        """获取缓存的文章内容"""
+        """获取缓存的文章内容，内容存储中没有时兼容读取旧的JSON文件"""
+        store=self._content_store()
+        if store is not None:
+            content=store.get(str(content_id))
+            if content is not None:
+                return content
         content_path = os.path.normpath(f"{self.content_cache_dir}/{content_id}.json")
         if not content_path.startswith(self.content_cache_dir):
             raise ValueError("Invalid content path: Path traversal detected.")
@@ -53,58 +204,132 @@ class RSS:
         if not hasattr(self, 'rss_file') or not self.rss_file:
             return None
         try:
-            with open(self.rss_file, "r", encoding="utf-8") as f:
+            with open(self.rss_file, "r", encoding="utf-8", newline="") as f:
                 return f.read()
         except FileNotFoundError:
             return None 
-    def generate_rss(self,rss_list: dict, title: str = "Mp-We-Rss", 
+    def get_rss_stream(self,chunk_size:int=CHUNK_SIZE,encoding:str=None):
+        """以分块方式读取缓存的RSS文件，缓存不存在时返回None
+
+        Args:
+            encoding: 预压缩编码(gzip/br)，为空时读取未压缩的原文件
+        """
+        if not hasattr(self, 'rss_file') or not self.rss_file:
+            return None
+        path = self.rss_file + ENCODINGS[encoding] if encoding else self.rss_file
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        def reader():
+            with f:
+                while True:
+                    chunk=f.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        return reader()
+    def get_encodings(self) -> list:
+        """返回已生成的预压缩编码，按优先级排列"""
+        return [encoding for encoding, suffix in ENCODINGS.items() if os.path.exists(self.rss_file + suffix)]
+    def get_meta(self):
+        """获取RSS缓存的元信息，用于条件请求(ETag/Last-Modified)
+
+        只读取缓存文件的stat和很小的meta文件，不读取RSS正文，缓存不存在时返回None
+        Returns:
+            包含newest(最新发布时间戳)、count(条目数)、mtime、etag、last_modified的字典
+        """
+        if not self.rss_file:
+            return None
+        try:
+            st=os.stat(self.rss_file)
+        except OSError:
+            return None
+        cached=_meta_cache.get(self.rss_file)
+        if cached is not None and cached[0]==st.st_mtime_ns:
+            return cached[1]
+        try:
+            with open(self.meta_file, "r", encoding="utf-8") as f:
+                meta=json.load(f)
+        except (OSError, ValueError):
+            meta={"newest":0,"count":0}
+        tag=hashlib.md5(f'{meta.get("newest",0)}-{meta.get("count",0)}-{st.st_mtime_ns}'.encode("utf-8")).hexdigest()
+        meta["mtime"]=int(st.st_mtime)
+        meta["etag"]=f'"{tag}"'
+        meta["last_modified"]=formatdate(st.st_mtime, usegmt=True)
+        _meta_cache[self.rss_file]=(st.st_mtime_ns, meta)
+        return meta
+    def remove(self):
+        """删除RSS缓存文件及其元信息"""
+        files = [self.rss_file + suffix for suffix in ENCODINGS.values()]
+        for file in files + [self.rss_file, self.meta_file]:
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+    def _write_meta(self,newest:int,count:int,link:str,extra:dict=None):
+        tmp_file=f"{self.meta_file}.{uuid.uuid4().hex}.tmp"
+        meta=dict(extra or {})
+        meta.update({"newest":newest,"count":count,"link":link})
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_file, self.meta_file)
+        except BaseException:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            raise
+    def generate_rss_stream(self,rss_list: Iterable[dict], title: str = "Mp-We-Rss", 
                     link: str = "https://github.com/rachelos/we-mp-rss",
-                    description: str = "RSS频道", language: str = "zh-CN"):
+                    description: str = "RSS频道", language: str = "zh-CN", meta: dict = None, feed_id: str = None):
+        """流式生成订阅源，格式由feed_format决定(RSS 2.0/Atom 1.0/JSON Feed 1.1)
+
+        逐条序列化rss_list中的条目，每个片段在写入缓存文件的同时yield给调用方，
+        rss_list可以是生成器，内存占用与条目数量无关。
+        缓存先写入临时文件，完整生成后再替换正式缓存文件，中途中断不会留下半截的文件。
+        meta中的附加信息会保存到缓存元信息中，供后台重建缓存时使用。
+        feed_id为订阅源标识，Atom格式用于生成订阅源的id。
+        """
         from core.config import cfg
-        full_context=bool(cfg.get("rss.full_context",False))
-        
-        # 创建根元素(RSS标准)
-        rss = ET.Element("rss", version="2.0")
-        if full_context==True:
-            rss.attrib["xmlns:content"] = "http://purl.org/rss/1.0/modules/content/"
-        channel=ET.SubElement(rss, "channel")
-        # 设置渠道信息
-        ET.SubElement(channel, "title").text = title
-        ET.SubElement(channel, "link").text = link
-        ET.SubElement(channel, "description").text = description
-        ET.SubElement(channel, "language").text = language
-        ET.SubElement(channel, "generator").text = "Mp-We-Rss"
-        ET.SubElement(channel, "lastBuildDate").text =datetime.now().strftime("%a, %d %b %Y %H:%M:%S %z")
-    
-        for rss_item in rss_list:
-            item = ET.SubElement(channel, "item")
-            ET.SubElement(item, "id").text = rss_item["id"]
-            ET.SubElement(item, "title").text = rss_item["title"]
-            ET.SubElement(item, "description").text = rss_item["description"] 
-            ET.SubElement(item, "guid").text = rss_item["link"]
-            if full_context==True:
-                try:
-                    if cfg.get("rss.cdata",False)==True:
-                        content = f"<![CDATA[{str(rss_item['content'])}]]>"  # 使用CDATA包裹内容
-                    else:
-                        content = str(rss_item['content'])
-                    ET.SubElement(item, "content:encoded").text = content
-                except Exception as e:
-                    print(f"Error adding content:encoded element: {e}")
-                pass
-            # ET.SubElement(item, "category").text = rss_item["category"]
-            # ET.SubElement(item, "author").text = rss_item["author"]
-            ET.SubElement(item, "link").text = rss_item["link"]
-            ET.SubElement(item, "pubDate").text = self.datetime_to_rfc822(str(rss_item["updated"]))
-
-        # 生成XML字符串(添加声明和美化输出)
-        tree_str = '<?xml version="1.0" encoding="utf-8"?>\r\n' + \
-                ET.tostring(rss, encoding="utf-8", method="xml", short_empty_elements=False).decode("utf-8")
+        serializer=self.serializer_class(
+            full_context=bool(cfg.get("rss.full_context",False)),
+            use_cdata=cfg.get("rss.cdata",False)==True,
+        )
         
+        writer=None
+        newest=0
+        count=0
         if self.rss_file is not None:
-            with open(self.rss_file, "w", encoding="utf-8") as f:
-                f.write(tree_str)
-        return tree_str
+            writer=CacheWriter(self.rss_file, precompress=bool(cfg.get("rss.precompress",True)))
+        try:
+            def emit(chunk:str)->str:
+                if writer is not None:
+                    writer.write(chunk)
+                return chunk
+
+            yield emit(serializer.head(title,link,description,language,datetime.now(),feed_id))
+            for rss_item in rss_list:
+                updated=datetime.fromisoformat(str(rss_item["updated"]))
+                chunk=serializer.item(rss_item,updated,count)
+                newest=max(newest,int(updated.timestamp()))
+                count+=1
+                yield emit(chunk)
+            yield emit(serializer.tail())
+            if writer is not None:
+                # 先写meta再替换缓存文件，保证新mtime对应的总是新的meta
+                self._write_meta(newest,count,str(link),meta)
+                writer.commit()
+                writer=None
+        finally:
+            if writer is not None:
+                writer.abort()
+
+    def generate_rss(self,rss_list: dict, title: str = "Mp-We-Rss", 
+                    link: str = "https://github.com/rachelos/we-mp-rss",
+                    description: str = "RSS频道", language: str = "zh-CN"):
+        return "".join(self.generate_rss_stream(rss_list,title=title,link=link,description=description,language=language))
 
     def add_logo_prefix_to_urls(self, text: str) -> str:
         """在字符串中所有http/https开头的图片URL前添加/static/res/logo/前缀
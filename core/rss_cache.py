@@ -0,0 +1,228 @@
+import threading
+import time
+import datetime
+import hashlib
+import heapq
+import itertools
+from core.rss import RSS
+from core.config import cfg
+from core.print import print_error, print_info
+from core.pagination import keyset_filter, encode_cursor
+
+# 公众号列表RSS的缓存名称
+ALL_FEEDS = "all"
+# 聚合订阅源的缓存名称前缀
+AGGREGATE_PREFIX = "agg_"
+# 聚合订阅源只缓存默认分页(limit, offset)
+AGGREGATE_CACHE_PAGE = (100, 0)
+
+def needs_content() -> bool:
+    """生成订阅源时是否需要文章正文：输出全文或使用本地文章链接(需要缓存正文)"""
+    return bool(cfg.get("rss.full_context", False) or cfg.get("rss.local", False))
+
+def with_content(query):
+    """需要正文时随文章批量加载正文，否则不读取正文表"""
+    if needs_content():
+        from sqlalchemy.orm import selectinload
+        from core.models.article import Article
+        return query.options(selectinload(Article.body))
+    return query
+
+def article_rss_items(rss: RSS, articles, rss_domain: str, mp_names: dict):
+    """将文章逐条转换为RSS条目，同时缓存文章内容
+
+    :param mp_names: 公众号ID到公众号名称的映射
+    """
+    load_content = needs_content()
+    for article in articles:
+        content = article.content if load_content else None
+        if load_content:
+            # 缓存文章内容
+            content_data = {
+                "id": article.id,
+                "title": article.title,
+                "content": content,
+                "publish_time": article.publish_time,
+                "mp_id": article.mp_id,
+                "mp_name": mp_names.get(article.mp_id, "")
+            }
+            rss.cache_content(article.id, content_data)
+        # 转换为RSS格式数据
+        yield {
+            "id": str(article.id),
+            "title": article.title,
+            "link":  f"{rss_domain}rss/feed/{article.id}" if cfg.get("rss.local",False) else article.url,
+            "description": article.description if article.description != "" else article.title,
+            "content": content,
+            "updated": datetime.datetime.fromtimestamp(article.publish_time)
+        }
+
+def build_mp_rss(rss: RSS, session, feed, limit: int, offset: int, rss_domain: str, cursor: str = None):
+    """生成公众号文章订阅源，格式由rss.feed_format决定，返回流式生成器
+
+    :param cursor: 游标分页，不为None时按(publish_time, id)定位并忽略offset
+    """
+    from core.models.article import Article
+    # 查询文章列表，分批从数据库读取，避免一次性加载全部正文
+    query = with_content(session.query(Article).filter(Article.mp_id == feed.id))
+    if cursor is not None:
+        articles = keyset_filter(query, Article.publish_time, Article.id, cursor).limit(limit).yield_per(20)
+    else:
+        articles = query.order_by(Article.publish_time.desc()).limit(limit).offset(offset).yield_per(20)
+    return rss.generate_rss_stream(article_rss_items(rss, articles, rss_domain, {feed.id: feed.mp_name}), title=f"{feed.mp_name}",link=rss_domain,description=feed.mp_intro,feed_id=feed.id)
+
+def build_feeds_rss(rss: RSS, session, limit: int, offset: int, rss_domain: str):
+    """生成公众号列表订阅源，格式由rss.feed_format决定，返回流式生成器"""
+    from core.models.feed import Feed
+    feeds = session.query(Feed).order_by(Feed.created_at.desc()).limit(limit).offset(offset).all()
+    # 转换为RSS格式数据
+    rss_list = ({
+        "id": str(feed.id),
+        "title": feed.mp_name,
+        "link":  f"{rss_domain}rss/{feed.id}",
+        "description": feed.mp_intro,
+        "updated": feed.created_at.isoformat()
+    } for feed in feeds)
+    return rss.generate_rss_stream(rss_list, title="WeRSS订阅",link=rss_domain,feed_id=ALL_FEEDS)
+
+def aggregate_name(mp_ids: list = None) -> str:
+    """聚合订阅源的缓存名称，公众号ID集合相同则名称相同"""
+    if not mp_ids:
+        return f"{AGGREGATE_PREFIX}all"
+    key = hashlib.md5(",".join(sorted(set(mp_ids))).encode("utf-8")).hexdigest()[:16]
+    return f"{AGGREGATE_PREFIX}{key}"
+
+def iter_feed_articles(session, mp_id: str, batch: int = 20):
+    """按发布时间倒序分批读取某个公众号的文章，只在需要时用游标查询下一批"""
+    from core.models.article import Article
+    cursor = None
+    while True:
+        query = with_content(session.query(Article).filter(Article.mp_id == mp_id))
+        rows = keyset_filter(query, Article.publish_time, Article.id, cursor).limit(batch).all()
+        yield from rows
+        if len(rows) < batch:
+            return
+        cursor = encode_cursor(rows[-1].publish_time, rows[-1].id)
+
+def merge_articles(session, mp_ids: list, limit: int, offset: int):
+    """k路归并多个公众号的文章
+
+    每个公众号的文章已按发布时间倒序，使用堆合并后只读取前limit+offset篇，
+    不需要对整张文章表排序。
+    """
+    batch = max(1, min(limit + offset, 20))
+    streams = [iter_feed_articles(session, mp_id, batch) for mp_id in mp_ids]
+    merged = heapq.merge(*streams, key=lambda article: article.publish_time or 0, reverse=True)
+    return itertools.islice(merged, offset, offset + limit)
+
+def build_aggregate_rss(rss: RSS, session, mp_ids: list, limit: int, offset: int, rss_domain: str):
+    """生成多个公众号的聚合订阅源，mp_ids为空时聚合全部公众号，返回流式生成器"""
+    from core.models.feed import Feed
+    query = session.query(Feed)
+    if mp_ids:
+        query = query.filter(Feed.id.in_(mp_ids))
+    mp_names = {feed.id: feed.mp_name for feed in query.all()}
+    articles = merge_articles(session, list(mp_names), limit, offset)
+    return rss.generate_rss_stream(article_rss_items(rss, articles, rss_domain, mp_names),
+        title="WeRSS聚合订阅", link=rss_domain, description="、".join(mp_names.values()),
+        meta={"mp_ids": sorted(set(mp_ids)) if mp_ids else None}, feed_id=aggregate_name(mp_ids))
+
+class RssCacheRefresher:
+    """RSS缓存刷新器
+
+    文章入库或公众号信息变更时标记对应公众号及公众号列表的缓存过期，
+    由后台线程合并短时间内的多次变更后，只重建已经生成过缓存的源。
+    """
+
+    def __init__(self, delay: float = 2.0):
+        """
+        :param delay: 收到变更后等待的秒数，用于合并批量入库产生的多次变更
+        """
+        self.delay = delay
+        self._stale = set()
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread = None
+
+    def invalidate(self, feed_id: str = None) -> None:
+        """标记公众号RSS缓存过期，同时标记公众号列表缓存过期
+
+        Args:
+            feed_id: 公众号ID，为空时只标记公众号列表
+        """
+        with self._lock:
+            if feed_id:
+                self._stale.add(feed_id)
+            self._stale.add(ALL_FEEDS)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._event.set()
+
+    def _run(self) -> None:
+        while True:
+            self._event.wait()
+            time.sleep(self.delay)
+            with self._lock:
+                self._event.clear()
+                stale, self._stale = self._stale, set()
+            stale |= self.stale_aggregates(stale - {ALL_FEEDS})
+            for name in stale:
+                try:
+                    self.rebuild(name)
+                except Exception as e:
+                    print_error(f"重建RSS缓存[{name}]失败: {e}")
+
+    def stale_aggregates(self, feed_ids: set) -> set:
+        """返回包含指定公众号的聚合订阅源缓存名称"""
+        names = set()
+        if not feed_ids:
+            return names
+        for name in RSS.list_cache_names(AGGREGATE_PREFIX):
+            limit, offset, feed_format = RSS.list_caches(name)[0]
+            meta = RSS(name=f"{name}_{limit}_{offset}", feed_format=feed_format).get_meta() or {}
+            mp_ids = meta.get("mp_ids")
+            if not mp_ids or feed_ids.intersection(mp_ids):
+                names.add(name)
+        return names
+
+    def rebuild(self, name: str) -> None:
+        """重建某个源已生成的全部分页缓存"""
+        pages = RSS.list_caches(name)
+        if not pages:
+            return
+        from core.db import DB
+        session = DB.get_session()
+        try:
+            feed = None
+            if name != ALL_FEEDS and not name.startswith(AGGREGATE_PREFIX):
+                from core.models.feed import Feed
+                feed = session.query(Feed).filter(Feed.id == name).first()
+            rebuilt = 0
+            for limit, offset, feed_format in pages:
+                rss = RSS(name=f"{name}_{limit}_{offset}", feed_format=feed_format)
+                meta = rss.get_meta() or {}
+                if name.startswith(AGGREGATE_PREFIX) and (limit, offset) != AGGREGATE_CACHE_PAGE:
+                    # 旧版本为聚合订阅的任意分页生成的缓存，不再重建
+                    rss.remove()
+                    continue
+                if "link" not in meta or (name != ALL_FEEDS and not name.startswith(AGGREGATE_PREFIX) and feed is None):
+                    # 缓存缺少元信息(无法确定生成时的域名)或公众号已删除，删除缓存，由下次请求重新生成
+                    rss.remove()
+                    continue
+                # 未配置rss.base_url时沿用生成缓存时的域名，空字符串(相对链接)同样有效
+                rss_domain = cfg.get("rss.base_url", "") or meta["link"]
+                if name == ALL_FEEDS:
+                    stream = build_feeds_rss(rss, session, limit, offset, rss_domain)
+                elif name.startswith(AGGREGATE_PREFIX):
+                    stream = build_aggregate_rss(rss, session, meta.get("mp_ids"), limit, offset, rss_domain)
+                else:
+                    stream = build_mp_rss(rss, session, feed, limit, offset, rss_domain)
+                for _ in stream:
+                    pass
+                rebuilt += 1
+            print_info(f"RSS缓存[{name}]已重建{rebuilt}页")
+        finally:
+            session.close()
+
+RssCache = RssCacheRefresher()
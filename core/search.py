@@ -0,0 +1,201 @@
+import re
+import html
+import threading
+from sqlalchemy import text, select, table, column
+from sqlalchemy.orm import selectinload
+from core.print import print_info, print_warning
+from core.pagination import encode_cursor, decode_cursor
+
+# 全文索引表
+FTS_TABLE = "articles_fts"
+# SQLite文章ID到索引表rowid的映射，FTS5按rowid更新和删除不需要扫描整张索引表
+FTS_IDS = "articles_fts_ids"
+# 各列权重：标题、摘要、正文
+WEIGHTS = (10.0, 5.0, 1.0)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_BLOCK_RE = re.compile(r"<(script|style)[^>]*>.*?</\1>", re.S | re.I)
+_SPACE_RE = re.compile(r"\s+")
+
+def html_to_text(content: str) -> str:
+    """提取HTML正文的纯文本"""
+    if not content:
+        return ""
+    content = _BLOCK_RE.sub(" ", content)
+    content = _TAG_RE.sub(" ", content)
+    return _SPACE_RE.sub(" ", html.unescape(content)).strip()
+
+class ArticleSearch:
+    """文章全文检索
+
+    索引标题、摘要和正文纯文本，保存在单独的索引表中：
+    SQLite使用FTS5(trigram分词，支持中文子串)并按bm25排序，
+    MySQL使用ngram分词的FULLTEXT索引并按相关度排序，
+    其他数据库退化为LIKE查询。
+    索引随文章入库和内容补采在同一事务中更新。
+    """
+
+    def __init__(self):
+        self.dialect = None
+        self.tokenizer = None
+        self._lock = threading.Lock()
+
+    def setup(self, engine) -> None:
+        """按数据库类型创建索引表"""
+        with self._lock:
+            self.dialect = engine.dialect.name
+            try:
+                with engine.begin() as conn:
+                    if self.dialect == "sqlite":
+                        self._setup_sqlite(conn)
+                    elif self.dialect in ("mysql", "mariadb"):
+                        conn.execute(text(
+                            f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+                            "id VARCHAR(255) PRIMARY KEY, title TEXT, description TEXT, body LONGTEXT, "
+                            f"FULLTEXT KEY ft_{FTS_TABLE} (title, description, body) WITH PARSER ngram"
+                            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+                        ))
+                    else:
+                        self.dialect = None
+            except Exception as e:
+                print_warning(f"创建全文索引失败，搜索将使用LIKE查询: {e}")
+                self.dialect = None
+
+    def _setup_sqlite(self, conn) -> None:
+        row = conn.execute(text("SELECT sql FROM sqlite_master WHERE name=:name"), {"name": FTS_TABLE}).first()
+        if row is not None:
+            self.tokenizer = "trigram" if "trigram" in row[0] else "unicode61"
+        else:
+            self._create_fts(conn)
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name=:name"), {"name": FTS_IDS}).first() is None:
+            conn.execute(text(f"CREATE TABLE {FTS_IDS} (fts_rowid INTEGER PRIMARY KEY, id VARCHAR(255) NOT NULL UNIQUE)"))
+            # 旧版本建立的索引按已有的rowid建立映射
+            conn.execute(text(f"INSERT OR IGNORE INTO {FTS_IDS} (fts_rowid, id) SELECT rowid, id FROM {FTS_TABLE}"))
+
+    def _create_fts(self, conn) -> None:
+        # trigram需要SQLite 3.34以上，不支持时使用默认分词
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    f"id UNINDEXED, title, description, body, tokenize='{tokenizer}')"
+                ))
+                self.tokenizer = tokenizer
+                return
+            except Exception:
+                if tokenizer == "unicode61":
+                    raise
+
+    @property
+    def enabled(self) -> bool:
+        return self.dialect is not None
+
+    def index(self, session, articles) -> None:
+        """
+        更新文章索引，调用方负责提交事务
+        :param articles: 文章对象或字典，需包含id、title、description、content
+        """
+        if not self.enabled:
+            return
+        rows = []
+        for article in articles:
+            get = article.get if isinstance(article, dict) else lambda key: getattr(article, key, None)
+            rows.append({
+                "id": str(get("id")),
+                "title": get("title") or "",
+                "description": get("description") or "",
+                "body": html_to_text(get("content")),
+            })
+        if not rows:
+            return
+        if self.dialect == "sqlite":
+            ids = [{"id": row["id"]} for row in rows]
+            session.execute(text(f"INSERT OR IGNORE INTO {FTS_IDS} (id) VALUES (:id)"), ids)
+            session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid=(SELECT fts_rowid FROM {FTS_IDS} WHERE id=:id)"), ids)
+            session.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, id, title, description, body) "
+                                 f"SELECT fts_rowid, :id, :title, :description, :body FROM {FTS_IDS} WHERE id=:id"), rows)
+        else:
+            session.execute(text(f"REPLACE INTO {FTS_TABLE} (id, title, description, body) VALUES (:id, :title, :description, :body)"), rows)
+
+    def remove(self, session, article_id: str) -> None:
+        """删除文章索引，调用方负责提交事务"""
+        if self.dialect == "sqlite":
+            session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid=(SELECT fts_rowid FROM {FTS_IDS} WHERE id=:id)"), {"id": article_id})
+            session.execute(text(f"DELETE FROM {FTS_IDS} WHERE id=:id"), {"id": article_id})
+        elif self.enabled:
+            session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE id=:id"), {"id": article_id})
+
+    def rebuild_missing(self, session, batch: int = 200) -> int:
+        """为尚未建立索引的文章补建索引，返回补建数量"""
+        if not self.enabled:
+            return 0
+        from core.models.article import Article
+        total = 0
+        while True:
+            indexed = select(column("id")).select_from(table(FTS_IDS if self.dialect == "sqlite" else FTS_TABLE))
+            articles = session.query(Article).options(selectinload(Article.body))\
+                .filter(Article.id.not_in(indexed)).limit(batch).all()
+            if not articles:
+                break
+            self.index(session, articles)
+            session.commit()
+            total += len(articles)
+        if total:
+            print_info(f"已为{total}篇文章补建全文索引")
+        return total
+
+    def _terms(self, keyword: str) -> list:
+        return [term for term in keyword.split() if term]
+
+    def _match_query(self, keyword: str, params: dict) -> str:
+        """返回(id, score)的子查询，score越小越相关"""
+        terms = self._terms(keyword)
+        w = ", ".join(str(weight) for weight in WEIGHTS)
+        if self.dialect == "sqlite" and (self.tokenizer != "trigram" or all(len(term) >= 3 for term in terms)):
+            # 每个词加引号按短语匹配，多个词同时匹配
+            params["q"] = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+            return f"SELECT id, bm25({FTS_TABLE}, 0.0, {w}) AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q"
+        if self.dialect in ("mysql", "mariadb"):
+            params["q"] = keyword
+            match = "MATCH(title, description, body) AGAINST (:q IN NATURAL LANGUAGE MODE)"
+            return f"SELECT id, -({match}) AS score FROM {FTS_TABLE} WHERE {match}"
+        # trigram无法匹配少于3个字的词，或没有全文索引时使用LIKE
+        source, columns = (FTS_TABLE, ("title", "description", "body")) if self.enabled else ("articles", ("title", "description"))
+        conditions = []
+        for i, term in enumerate(terms):
+            params[f"t{i}"] = f"%{term}%"
+            conditions.append("(" + " OR ".join(f"{col} LIKE :t{i}" for col in columns) + ")")
+        return f"SELECT id, 0.0 AS score FROM {source} WHERE " + " AND ".join(conditions)
+
+    def search(self, session, keyword: str, mp_id: str = None, cursor: str = None, limit: int = 10):
+        """
+        按相关度搜索文章
+        :param cursor: 上一页返回的游标，为空时从第一页开始
+        :return: (文章列表, 下一页游标)，没有下一页时游标为None
+        """
+        from core.models.article import Article
+        from core.models.base import DATA_STATUS
+        if not self._terms(keyword):
+            return [], None
+        params = {"deleted": DATA_STATUS.DELETED, "limit": limit + 1}
+        sql = f"SELECT s.id, s.score FROM ({self._match_query(keyword, params)}) s " \
+              "JOIN articles a ON a.id = s.id WHERE a.status != :deleted"
+        if mp_id:
+            sql += " AND a.mp_id = :mp_id"
+            params["mp_id"] = mp_id
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 2:
+                raise ValueError("无效的分页游标")
+            params["score"], params["last_id"] = values
+            sql += " AND (s.score > :score OR (s.score = :score AND s.id > :last_id))"
+        sql += " ORDER BY s.score, s.id LIMIT :limit"
+        rows = session.execute(text(sql), params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(float(rows[-1][1]), rows[-1][0])
+        articles = {article.id: article for article in session.query(Article).filter(Article.id.in_([row[0] for row in rows]))}
+        return [articles[row[0]] for row in rows if row[0] in articles], next_cursor
+
+Search = ArticleSearch()
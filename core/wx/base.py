@@ -1,4 +1,3 @@
-import requests
 import json
 from core.models import Feed
 
@@ -7,29 +6,39 @@ from core.models.feed import Feed
 from core.config import Config
 from core.config import cfg
 from core.print import print_error,print_info
+from core.log import logger
+from core.rate_limit import RateLimit,SEARCH_BIZ,ARTICLE
+from core.content_extract import Extractor
+from core.http_client import Http
+from core.checkpoints import Checkpoints
 
 # 定义基类
 class WxGather:
     articles=[]
+    # 历史回填进度，不为None时从backfill["begin"]开始翻页，进度记录在其中而不是采集断点
+    backfill=None
     def all_count(self):
         if getattr(self, 'articles', None) is not None:
             return len(self.articles)
         return 0
     def Model(self):
-        if cfg.get("gather.model","web")=="web":
+        model=cfg.get("gather.model","web")
+        if model=="web":
             from core.wx import MpsWeb
             wx=MpsWeb()
+        elif model=="async":
+            from core.wx import MpsAsync
+            wx=MpsAsync()
         else:
             from core.wx import MpsApi
             wx=MpsApi()
         return wx
     def __init__(self,is_add:bool=False):
         self.articles=[]
+        self._pending=[]
         self.is_add=is_add
-        session=  requests.Session()
-        timeout = (5, 10)
-        session.timeout = timeout
-        self.session=session
+        # 共用进程内的连接池
+        self.session=Http.session
         self.get_token()
     def get_token(self):
         cfg.reload()
@@ -41,27 +50,209 @@ class WxGather:
             "Cookie":self.cookies,
             "User-Agent": self.user_agent 
         }
-    def FillBack(self,CallBack=None,data=None,Ext_Data=None):
+    def FillBack(self,CallBack=None,data=None,Ext_Data=None,BatchCallBack=None):
+        if data is None:
+            return
+        art={
+            "id":str(data['id']),
+            "mp_id":data['mp_id'],
+            "title":data['title'],
+            "url":data['link'],
+            "pic_url":data['cover'],
+            "content":data['content'],
+            "publish_time":data['update_time'],
+        }
+        if 'digest' in data:
+            art['description']=data['digest']
+        if BatchCallBack is not None:
+            # 批量模式，先缓存，由FlushBack按页批量入库
+            self._pending.append((art,Ext_Data))
+            return
         if CallBack is not None:
-            if data is not  None:
-                from core.models import Article
-                from datetime import datetime
-                art={
-                    "id":str(data['id']),
-                    "mp_id":data['mp_id'],
-                    "title":data['title'],
-                    "url":data['link'],
-                    "pic_url":data['cover'],
-                    "content":data['content'],
-                    "publish_time":data['update_time'],
-                }
-                if 'digest' in data:
-                    art['description']=data['digest']
-                if CallBack(art):
-                    art["ext"]=Ext_Data
-                    art.pop("content")
-                    self.articles.append(art)
+            if CallBack(art):
+                art["ext"]=Ext_Data
+                art.pop("content")
+                self.articles.append(art)
+    def FlushBack(self,BatchCallBack=None)->bool:
+        """批量入库FillBack缓存的文章
+
+        BatchCallBack接收文章列表，返回新增文章的ID列表，新增的文章记入articles，返回None表示入库失败
+        :return: 是否入库成功，没有待入库的文章时返回True
+        """
+        if BatchCallBack is None or not self._pending:
+            return True
+        pending,self._pending=self._pending,[]
+        new_ids=BatchCallBack([art for art,_ in pending])
+        if new_ids is None:
+            return False
+        new_ids=set(new_ids)
+        for art,Ext_Data in pending:
+            if art["id"] in new_ids:
+                art["ext"]=Ext_Data
+                art.pop("content")
+                self.articles.append(art)
+        return True
+
+
+    def new_items(self,Mps_id:str,items:list)->list:
+        """增量同步：整页批量判断文章是否已入库，返回未入库的文章
+
+        gather.incremental关闭时原样返回
+        """
+        if not items or not cfg.get("gather.incremental",True):
+            return items
+        from core.known_articles import KnownArticles
+        known=KnownArticles.known(Mps_id,[item["id"] for item in items])
+        return [item for item in items if str(item["id"]) not in known]
+
+    def checkpoint_start(self,Mps_id:str,MaxPage:int,count:int):
+        """
+        开始采集时读取断点，gather.checkpoint关闭时不记录断点
+        上次采集未完成时仍从第一页开始采集最新文章，由checkpoint_next跳到断点继续
+        :return: (起始页, 结束页(不包含))
+        """
+        self._checkpoint=None
+        self._resume=None
+        self._resumed=False
+        if self.backfill is not None:
+            start=int(self.backfill.get("begin",0))//count
+            self.backfill.update(count=count,next_begin=start*count,failed=False,done=False)
+            return start,start+MaxPage
+        if not Mps_id or not cfg.get("gather.checkpoint",True):
+            return 0,MaxPage
+        self._checkpoint=Mps_id
+        MaxPage,resume=Checkpoints.start(Mps_id,count,MaxPage)
+        if resume is not None:
+            self._resume={"page":resume[0],"last_aid":resume[1]}
+        return 0,MaxPage
+
+    def checkpoint_page(self,next_begin:int,last_aid:str=None):
+        """本页入库成功后记录断点，跳到上次的断点之前不覆盖断点"""
+        if self.backfill is not None:
+            self.backfill["next_begin"]=next_begin
+        elif getattr(self,'_checkpoint',None) and getattr(self,'_resume',None) is None:
+            Checkpoints.advance(self._checkpoint,next_begin,last_aid)
+
+    def checkpoint_next(self,i:int,items:list,new_items:list):
+        """
+        本页入库后决定下一页
+        上次采集中断时，最新文章采集完(遇到已采集的页)后跳到断点前一页，
+        用断点记录的最后一篇文章ID确认列表是否移动：该页有未采集的文章且找不到该ID时，
+        说明中断后有文章被删除、列表前移，继续往前查找，之后翻完剩余的页
+        :param items: 本页文章
+        :param new_items: 本页未采集过的文章
+        :return: 下一页，None表示停止翻页
+        """
+        resume=getattr(self,'_resume',None)
+        if resume is not None and "floor" in resume:
+            found=str(resume["last_aid"]) in {str(item["id"]) for item in items}
+            if not found and new_items and i-1>resume["floor"]:
+                print_info(f"第{i+1}页有未采集的文章，文章列表在中断后前移，继续往前查找")
+                return i-1
+            if not found:
+                print_info(f"第{i+1}页未找到断点文章，文章列表在中断后发生变化")
+            self._resume,self._resumed=None,True
+            return i+1
+        if resume is not None and i+1>=resume["page"]:
+            # 最新文章较多，已翻到断点位置
+            self._resume,self._resumed=None,True
+            resume=None
+        if new_items or self.backfill is not None or getattr(self,'_resumed',False):
+            return i+1
+        if resume is None:
+            return None
+        if not resume["last_aid"]:
+            self._resume,self._resumed=None,True
+            print_info(f"最新文章已采集，从上次中断的第{resume['page']+1}页继续采集")
+            return resume["page"]
+        resume["floor"]=i
+        print_info(f"最新文章已采集，从上次中断的第{resume['page']+1}页前一页继续采集")
+        return resume["page"]-1
+
+    def checkpoint_finish(self):
+        if self.backfill is not None:
+            self.backfill["done"]=True
+        mp_id,self._checkpoint=getattr(self,'_checkpoint',None),None
+        if mp_id:
+            Checkpoints.finish(mp_id)
 
+    def checkpoint_fail(self):
+        if self.backfill is not None and not self.backfill.get("done"):
+            self.backfill["failed"]=True
+        mp_id,self._checkpoint=getattr(self,'_checkpoint',None),None
+        if mp_id:
+            Checkpoints.fail(mp_id)
+
+    def record_total(self,total):
+        """记录接口返回的文章(发布)总数，用于估算回填总页数"""
+        if self.backfill is not None and total:
+            self.backfill["total"]=int(total)
+
+    def get_Articles_many(self,mps:list,Mp_Over_CallBack=None,Over_CallBack=None,**kwargs):
+        """
+        依次采集多个公众号，异步模式下并发采集
+        :param mps: 公众号列表，需包含id、faker_id、mp_name
+        :param Mp_Over_CallBack: 单个公众号采集结束时调用，参数为(公众号, 新增文章列表)
+        """
+        articles=[]
+        try:
+            for mp in mps:
+                try:
+                    self.get_Articles(mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,**kwargs)
+                except Exception as e:
+                    print_error(f"公众号[{mp.mp_name}]采集失败: {e}")
+                finally:
+                    articles.extend(self.articles)
+                    if Mp_Over_CallBack is not None:
+                        Mp_Over_CallBack(mp,self.articles)
+        finally:
+            self.articles=articles
+            self.Over(CallBack=Over_CallBack)
+
+    def content_page(self,url:str):
+        """抓取文章页面HTML，失败时返回None"""
+        try:
+            RateLimit.acquire(ARTICLE)
+            r = self.session.get(url, headers=self.headers)
+            if r.status_code == 200:
+                return r.text
+        except Exception as e:
+            logger.error(e)
+        return None
+
+    def content_parse(self,text:str):
+        """从文章页面HTML中提取正文，在正文解析进程池中执行，未找到正文时返回None"""
+        return Extractor.parse(text)
+
+    def content_extract(self,url:str):
+        text=self.content_page(url)
+        if text is None:
+            return ""
+        try:
+            return self.content_parse(text)
+        except Exception as e:
+            logger.error(e)
+        return ""
+
+    def content_extract_many(self,urls:list)->list:
+        """依次抓取多篇文章页面并提取正文
+
+        每抓取一篇就提交到进程池解析，解析与后续页面的抓取重叠执行
+        """
+        futures=[]
+        for url in urls:
+            text=self.content_page(url)
+            futures.append(Extractor.submit(text) if text is not None else None)
+        contents=[]
+        for future in futures:
+            content=""
+            if future is not None:
+                try:
+                    content=future.result()
+                except Exception as e:
+                    logger.error(e)
+            contents.append(content)
+        return contents
 
     #通过公众号码平台接口查询公众号
     def search_Biz(self,kw:str="",limit=5,offset=0):
@@ -84,7 +275,8 @@ class WxGather:
         }
         data={}
         try:
-            response = requests.get(
+            RateLimit.acquire(SEARCH_BIZ,self.token)
+            response = Http.get(
             url,
             params=params,
             headers=headers,
@@ -92,7 +284,7 @@ class WxGather:
             response.raise_for_status()  # 检查状态码是否为200
             data = response.text  # 解析JSON数据
             msg = json.loads(data)  # 手动解析
-            if msg['base_resp']['ret'] == 200013:
+            if RateLimit.report(SEARCH_BIZ,self.token,msg['base_resp']['ret']):
                 self.Error("frequencey control, stop at {}".format(str(kw)))
                 return
             if msg['base_resp']['ret'] != 0:
@@ -110,6 +302,7 @@ class WxGather:
     def Start(self,mp_id=None):
         print(f"开始")
         self.articles=[]
+        self._pending=[]
         self.get_token()
         import time
         self.update_mps(mp_id,Feed(
@@ -123,6 +316,7 @@ class WxGather:
             CallBack(item)
         pass
     def Error(self,error:str):
+        self.checkpoint_fail()
         self.Over()
         raise Exception(error)
     def Over(self,CallBack=None):
@@ -169,6 +363,7 @@ class WxGather:
                 update_data['status']=mp.status
 
             # 获取数据库会话并执行更新
+            # 同步时间和状态不显示在订阅源中，不需要刷新RSS缓存，有新文章时由入库操作刷新
             session = DB.get_session()
             try:
                 feed = session.query(Feed).filter(Feed.id == mp_id).first()
@@ -176,11 +371,11 @@ class WxGather:
                     for key, value in update_data.items():
                         print(f"更新公众号{mp_id}的{key}为{value}")
                         setattr(feed, key, value)
-                    session.commit()
+                    DB.write(session.commit)
                 else:
                     print_error(f"未找到ID为{mp_id}的公众号记录")
             finally:
-                pass
+                session.close()
                 
         except Exception as e:
             print_error(f"更新公众号状态失败: {e}")
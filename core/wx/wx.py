@@ -1,4 +1,4 @@
-import requests
+from core.http_client import Http
 import json
 import re
 import datetime
@@ -39,7 +39,7 @@ def search_Biz(kw:str="",limit=5,offset=0):
     }
     data={}
     try:
-        response = requests.get(
+        response = Http.get(
         url,
         params=params,
         headers=headers,
@@ -60,7 +60,7 @@ def content_extract(url):
         "Cookie": cfg.get("cookie"),
         "User-Agent": cfg.get("user_agent")
     }
-    r = requests.get(eval(url),headers=headers)
+    r = Http.get(eval(url),headers=headers)
     if r.status_code == 200:
         text = r.text
         soup = BeautifulSoup(text, 'html.parser')
@@ -108,7 +108,7 @@ def get_Articles(faker_id:str):
     }
     data={}
     try:
-        response = requests.get(url, params=params, headers=headers)
+        response = Http.get(url, params=params, headers=headers)
         response.raise_for_status  # 检查状态码是否为200
         data = response.text  # 解析JSON数据
         data = json.loads(data)  # 手动解析
@@ -209,11 +209,11 @@ def update_mps(mp_id:str, mp:Feed):
                 for key, value in update_data.items():
                     print(f"更新公众号{mp_id}的{key}为{value}")
                     setattr(feed, key, value)
-                session.commit()
+                DB.write(session.commit)
             else:
                 print(f"未找到ID为{mp_id}的公众号记录")
         finally:
-           pass
+            session.close()
             
     except Exception as e:
         print(f"更新公众号状态失败: {e}")
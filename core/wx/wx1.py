@@ -6,44 +6,14 @@ import yaml
 import re
 from bs4 import BeautifulSoup
 from .base import WxGather
+from core.config import cfg
+from core.rate_limit import RateLimit,ARTICLE,APPMSG
 from core.log import logger
 # 继承 BaseGather 类
 class MpsApi(WxGather):
 
-    # 重写 content_extract 方法
-    def content_extract(self,  url):
-        try:
-            session=self.session
-            r = session.get(url, headers=self.headers)
-            if r.status_code == 200:
-                text = r.text
-                if text is None:
-                    return
-                soup = BeautifulSoup(text, 'html.parser')
-                # 找到内容
-                js_content_div = soup.find('div', {'id': 'js_content'})
-                # 移除style属性中的visibility: hidden;
-                if js_content_div is None:
-                    return
-                js_content_div.attrs.pop('style', None)
-                # 找到所有的img标签
-                img_tags = js_content_div.find_all('img')
-                # 遍历每个img标签并修改属性，设置宽度为1080p
-                for img_tag in img_tags:
-                    if 'data-src' in img_tag.attrs:
-                        img_tag['src'] = img_tag['data-src']
-                        del img_tag['data-src']
-                    if 'style' in img_tag.attrs:
-                        style = img_tag['style']
-                        # 使用正则表达式替换width属性
-                        style = re.sub(r'width\s*:\s*\d+\s*px', 'width: 1080px', style)
-                        img_tag['style'] = style
-                return  js_content_div.prettify()
-        except Exception as e:
-                logger.error(e)
-        return ""
     # 重写 get_Articles 方法
-    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,begin=0,MaxPage:int=1,interval=1,Gather_Content=False,Item_Over_CallBack=None,Over_CallBack=None):
+    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,begin=0,MaxPage:int=1,interval=1,Gather_Content=False,Item_Over_CallBack=None,Over_CallBack=None,BatchCallBack=None):
         super().Start(mp_id=Mps_id)
         if self.Gather_Content:
              Gather_Content=True
@@ -65,26 +35,33 @@ class MpsApi(WxGather):
 
         # 连接超时
         session=self.session
-        # 起始页数
-        i = 0
+        # 流量控制后的重试次数
+        retries = 0
+        max_retries = int(cfg.get("rate_limit.retries",3))
+        # 起始页数，上次采集中断时采集最新文章后跳到断点继续
+        i,MaxPage = self.checkpoint_start(Mps_id,MaxPage,count)
         while True:
             if i >= MaxPage:
                 break
             begin = i * count
             params["begin"] = str(begin)
             print(f"第{i+1}页开始爬取\n")
-            # 随机暂停几秒，避免过快的请求导致过快的被查到
-            time.sleep(random.randint(0,interval))
+            # 按令牌桶限速，避免过快的请求导致过快的被查到
+            RateLimit.acquire(APPMSG,self.token,faker_id)
             try:
                 resp = session.get(url, headers=self.headers, params = params, verify=False)
                 
                 msg = resp.json()
 
                 
-                # 流量控制了, 退出
-                if msg['base_resp']['ret'] == 200013:
-                    super().Error("frequencey control, stop at {}".format(str(begin)))
-                    break
+                # 流量控制了, 降速冷却后重试本页，多次触发则退出
+                if RateLimit.report(APPMSG,self.token,msg['base_resp']['ret'],faker_id):
+                    retries += 1
+                    if retries > max_retries:
+                        super().Error("frequencey control, stop at {}".format(str(begin)))
+                        break
+                    continue
+                retries = 0
                 
                 if msg['base_resp']['ret'] == 200003:
                     super().Error("Invalid Session, stop at {}".format(str(begin)))
@@ -92,33 +69,55 @@ class MpsApi(WxGather):
                 
                 # 如果返回的内容中为空则结束
                 if 'app_msg_list' not in msg:
+                    self.checkpoint_finish()
                     super().Error("all ariticle parsed")
                     break
                 if msg['base_resp']['ret'] != 0:
                     super().Error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],msg['base_resp']['ret']))
                     break    
                 if "app_msg_list" in msg:
-                    for item in msg["app_msg_list"]:
-                        time.sleep(random.randint(1,3))
-                        # info = '"{}","{}","{}","{}"'.format(str(item["aid"]), item['title'], item['link'], str(item['create_time']))
-                        if Gather_Content:
-                            item["content"] = self.content_extract(item['link'])
-                        else:
-                            item["content"] = ""
+                    items=msg["app_msg_list"]
+                    self.record_total(msg.get("app_msg_cnt"))
+                    for item in items:
                         item["id"] = item["aid"]
                         item["mp_id"] = Mps_id
-                        if CallBack is not None:
-                            super().FillBack(CallBack=CallBack,data=item,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id})
+                    new_items=self.new_items(Mps_id,items)
+                    if Gather_Content:
+                        contents = self.content_extract_many([item['link'] for item in new_items])
+                    else:
+                        contents = [""]*len(new_items)
+                    for item,content in zip(new_items,contents):
+                        # info = '"{}","{}","{}","{}"'.format(str(item["aid"]), item['title'], item['link'], str(item['create_time']))
+                        item["content"] = content
+                        if CallBack is not None or BatchCallBack is not None:
+                            super().FillBack(CallBack=CallBack,data=item,Ext_Data={"mp_title":Mps_title,"mp_id":Mps_id},BatchCallBack=BatchCallBack)
                     print(f"第{i+1}页爬取成功\n")
+                    if not items:
+                        break
+                    # 本页入库成功后记录断点，入库失败时停止，下次从本页继续
+                    if not super().FlushBack(BatchCallBack=BatchCallBack):
+                        print(f"第{i+1}页入库失败，停止采集\n")
+                        self.checkpoint_fail()
+                        break
+                    self.checkpoint_page((i+1)*count,items[-1]["id"])
+                    next_page = self.checkpoint_next(i,items,new_items)
+                    if next_page is None:
+                        print(f"第{i+1}页文章均已采集，停止翻页\n")
+                        break
                 # 翻页
-                i += 1
+                i = next_page
             except requests.exceptions.Timeout:
                 print("Request timed out")
+                self.checkpoint_fail()
                 break
             except requests.exceptions.RequestException as e:
                 print(f"Request error: {e}")
+                self.checkpoint_fail()
                 break
             finally:
+                # 每页结束批量入库一次
+                super().FlushBack(BatchCallBack=BatchCallBack)
                 super().Item_Over(item={Mps_id:Mps_id,Mps_title:Mps_title},CallBack=Item_Over_CallBack)
+        self.checkpoint_finish()
         super().Over(CallBack=Over_CallBack)
         pass
\ No newline at end of file
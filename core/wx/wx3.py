@@ -0,0 +1,198 @@
+import asyncio
+import copy
+import threading
+import httpx
+from .wx2 import MpsWeb
+from core.models.feed import Feed
+from core.config import cfg
+from core.log import logger
+from core.print import print_error,print_info
+from core.rate_limit import RateLimit,ARTICLE,APPMSG_PUBLISH
+from core.content_extract import Extractor
+from core.http_client import Http
+
+# 登录失效，触发后停止所有公众号采集
+INVALID_SESSION = 200003
+
+def run_sync(coro):
+    """在同步代码中执行协程，当前线程已有事件循环时在新线程中执行"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    result={}
+    def runner():
+        try:
+            result["value"]=asyncio.run(coro)
+        except BaseException as e:
+            result["error"]=e
+    t=threading.Thread(target=runner,daemon=True)
+    t.start()
+    t.join()
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
+
+class MpsAsync(MpsWeb):
+    """异步并发采集
+
+    基于httpx.AsyncClient，多个公众号共用一个连接池并发采集，
+    同时采集的公众号数量由gather.concurrency限制，单个公众号内按页顺序采集，
+    每页的文章内容并发抓取。入库回调与MpsWeb一致(FillBack/FlushBack)，在线程池中执行。
+    """
+    url = "https://mp.weixin.qq.com/cgi-bin/appmsgpublish"
+    count = 5
+
+    def _worker(self):
+        """复制出单个公众号使用的采集状态，避免并发时共享articles"""
+        worker=copy.copy(self)
+        worker.articles=[]
+        worker._pending=[]
+        return worker
+
+    def _client(self,concurrency:int):
+        return Http.new_async_client(max_connections=concurrency*2,headers=self.headers,verify=False)
+
+    async def content_fetch(self,client:httpx.AsyncClient,url:str):
+        try:
+            await RateLimit.acquire_async(ARTICLE)
+            r=await client.get(url)
+            if r.status_code == 200:
+                return await Extractor.parse_async(r.text)
+        except Exception as e:
+            logger.error(e)
+        return ""
+
+    async def gather_mp(self,client:httpx.AsyncClient,mp:Feed,state:dict,CallBack=None,MaxPage:int=1,interval=1,Gather_Content=False,Item_Over_CallBack=None,BatchCallBack=None):
+        """采集单个公众号，流量控制或登录失效时设置state["stop"]并停止所有公众号"""
+        await asyncio.to_thread(self.Start,mp_id=mp.id)
+        Gather_Content=Gather_Content or self.Gather_Content
+        print(f"异步并发模式,是否采集[{mp.mp_name}]内容：{Gather_Content}\n")
+        ext={"mp_title":mp.mp_name,"mp_id":mp.id}
+        params = {
+            "sub": "list",
+            "sub_action": "list_ex",
+            "begin": 0,
+            "count": self.count,
+            "fakeid": mp.faker_id,
+            "token": self.token,
+            "lang": "zh_CN",
+            "f": "json",
+            "ajax": 1
+        }
+        retries=0
+        max_retries=int(cfg.get("rate_limit.retries",3))
+        # 上次采集中断时采集最新文章后跳到断点继续
+        i,MaxPage=await asyncio.to_thread(self.checkpoint_start,mp.id,MaxPage,self.count)
+        while i < MaxPage:
+            if state.get("stop"):
+                break
+            begin=i*self.count
+            params["begin"]=str(begin)
+            # 按令牌桶限速，异步等待不占用其他公众号的采集
+            await RateLimit.acquire_async(APPMSG_PUBLISH,self.token,mp.faker_id)
+            try:
+                resp=await client.get(self.url,params=params)
+                msg=resp.json()
+                ret=msg['base_resp']['ret']
+                # 流量控制了, 降速冷却后重试本页，多次触发则停止所有公众号
+                if RateLimit.report(APPMSG_PUBLISH,self.token,ret,mp.faker_id):
+                    retries+=1
+                    if retries > max_retries:
+                        state["stop"]="frequencey control, stop at {}".format(begin)
+                        print_error(state["stop"])
+                        await asyncio.to_thread(self.checkpoint_fail)
+                        break
+                    continue
+                retries=0
+                if ret == INVALID_SESSION:
+                    state["stop"]="Invalid Session, stop at {}".format(begin)
+                    print_error(state["stop"])
+                    await asyncio.to_thread(self.checkpoint_fail)
+                    break
+                # 如果返回的内容中为空则结束
+                if 'publish_page' not in msg:
+                    print_info(f"[{mp.mp_name}] all ariticle parsed")
+                    break
+                if ret != 0:
+                    print_error("错误原因:{}:代码:{}".format(msg['base_resp']['err_msg'],ret))
+                    await asyncio.to_thread(self.checkpoint_fail)
+                    break
+                page_items=list(self.publish_items(msg,mp.id))
+                items=await asyncio.to_thread(self.new_items,mp.id,page_items)
+                if Gather_Content:
+                    contents=await asyncio.gather(*(self.content_fetch(client,item['link']) for item in items))
+                else:
+                    contents=[""]*len(items)
+                for item,content in zip(items,contents):
+                    item["content"]=content
+                if CallBack is not None or BatchCallBack is not None:
+                    # 入库失败时停止，下次从本页继续
+                    if not await asyncio.to_thread(self._fill_page,items,ext,CallBack,BatchCallBack):
+                        print_error(f"[{mp.mp_name}]第{i+1}页入库失败，停止采集")
+                        await asyncio.to_thread(self.checkpoint_fail)
+                        break
+                print(f"[{mp.mp_name}]第{i+1}页爬取成功\n")
+                if not page_items:
+                    break
+                # 本页入库后记录断点
+                await asyncio.to_thread(self.checkpoint_page,(i+1)*self.count,page_items[-1]["id"])
+                next_page=self.checkpoint_next(i,page_items,items)
+                if next_page is None:
+                    print(f"[{mp.mp_name}]第{i+1}页文章均已采集，停止翻页\n")
+                    break
+                i=next_page
+            except httpx.HTTPError as e:
+                print(f"Request error: {e}")
+                await asyncio.to_thread(self.checkpoint_fail)
+                break
+            finally:
+                self.Item_Over(item=ext,CallBack=Item_Over_CallBack)
+        await asyncio.to_thread(self.checkpoint_finish)
+
+    def _fill_page(self,items:list,ext:dict,CallBack=None,BatchCallBack=None)->bool:
+        """返回是否入库成功"""
+        for item in items:
+            self.FillBack(CallBack=CallBack,data=item,Ext_Data=ext,BatchCallBack=BatchCallBack)
+        # 每页结束批量入库一次
+        return self.FlushBack(BatchCallBack=BatchCallBack)
+
+    async def gather_mps(self,mps:list,Mp_Over_CallBack=None,**kwargs):
+        """
+        并发采集多个公众号
+        :param mps: 公众号列表，需包含id、faker_id、mp_name
+        :param Mp_Over_CallBack: 单个公众号采集结束时调用，参数为(公众号, 新增文章列表)
+        """
+        self.get_token()
+        self.articles=[]
+        concurrency=max(1,int(cfg.get("gather.concurrency",5)))
+        sem=asyncio.Semaphore(concurrency)
+        state={}
+        async with self._client(concurrency) as client:
+            async def run(mp):
+                async with sem:
+                    worker=self._worker()
+                    try:
+                        if not state.get("stop"):
+                            await worker.gather_mp(client,mp,state,**kwargs)
+                    except Exception as e:
+                        print_error(f"公众号[{mp.mp_name}]采集失败: {e}")
+                    finally:
+                        self.articles.extend(worker.articles)
+                        if Mp_Over_CallBack is not None:
+                            await asyncio.to_thread(Mp_Over_CallBack,mp,worker.articles)
+            await asyncio.gather(*(run(mp) for mp in mps))
+        if state.get("stop"):
+            raise Exception(state["stop"])
+
+    def get_Articles_many(self,mps:list,Over_CallBack=None,**kwargs):
+        try:
+            run_sync(self.gather_mps(mps,**kwargs))
+        finally:
+            self.Over(CallBack=Over_CallBack)
+
+    # 重写 get_Articles 方法
+    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,begin:int=0,MaxPage:int=1,interval=1,Gather_Content=False,Item_Over_CallBack=None,Over_CallBack=None,BatchCallBack=None):
+        mp=Feed(id=Mps_id,faker_id=faker_id,mp_name=Mps_title)
+        self.get_Articles_many([mp],CallBack=CallBack,MaxPage=MaxPage,interval=interval,Gather_Content=Gather_Content,
+                               Item_Over_CallBack=Item_Over_CallBack,Over_CallBack=Over_CallBack,BatchCallBack=BatchCallBack)
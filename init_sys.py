@@ -12,16 +12,16 @@ from core.print import print_info, print_error
 def init_user(_db: Db):
     try:
       username,password=os.getenv("USERNAME", "admin"),os.getenv("PASSWORD", "admin@123")
-      session=_db.get_session()
-      session.merge(User(
-          id=0,
-          username=username,
-          password_hash=pwd_context.hash(password),
-          ))
-      session.commit()
+      # 出错时回滚并归还连接
+      with _db.session_scope() as session:
+          session.merge(User(
+              id=0,
+              username=username,
+              password_hash=pwd_context.hash(password),
+              ))
+          session.commit()
     except Exception as e:
-        # print_error(f"Init error: {str(e)}")
-        pass
+        print_error(f"初始化用户失败: {str(e)}")
 def sync_models():
      # 同步模型到表结构
          from core.data_sync import ModelSync
@@ -29,6 +29,12 @@ def sync_models():
          time.sleep(3)
          sync=ModelSync(eng=DB.get_engine())
          sync.sync_all()
+         # 旧版本正文迁移到article_contents
+         DB.migrate_article_contents()
+         # 为已有文章补建全文索引
+         from core.search import Search
+         with DB.session_scope() as session:
+             Search.rebuild_missing(session)
          print_info("模型同步完成")
 
      
@@ -1,5 +1,9 @@
-from jobs import start_job
+# 正文解析子进程(spawn)会重新执行本文件，模块级只导入标准库，其余导入放在__main__中
 if __name__ == '__main__':
+    # 打包后的程序启动正文解析子进程时需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+    from jobs import start_job
     import init_sys as init
     init.init()
     # 启动定时任务
@@ -5,14 +5,16 @@ from core.db import DB
 from core.config import DEBUG,cfg
 from core.models.article import Article
 def delete_article(id:str):
-    try:
-        session=DB.get_session()
-        article = session.query(Article).filter(Article.id == id).first()
-        session.delete(article)
-        session.commit()
-    except Exception as e:
-        print(e)
-        pass
+    with DB.session_scope() as session:
+        try:
+            article = session.query(Article).filter(Article.id == id).first()
+            session.delete(article)
+            DB.write(session.commit)
+            from core.known_articles import KnownArticles
+            KnownArticles.discard(article.mp_id,article.id)
+        except Exception as e:
+            print(e)
+            pass
 
 
 
@@ -25,6 +27,12 @@ def UpdateArticle(art:dict):
         mps_count=mps_count+1
         return True
     return False
+def UpdateArticles(arts:list):
+    """按页批量入库，返回新增文章的ID列表"""
+    if DEBUG:
+        for art in arts:
+            delete_article(art['id'])
+    return DB.add_articles(arts)
 def Update_Over(data=None):
     print("更新完成",data)
     pass
\ No newline at end of file
@@ -12,7 +12,7 @@ def fetch_articles_without_content():
     ga=WxGather().Model()
     try:
         # 查询content为空的文章
-        articles = session.query(Article).filter(Article.content == None).limit(10).all()
+        articles = session.query(Article).filter(Article.body == None).limit(10).all()
         
         if not articles:
             print("没有找到content为空的文章")
@@ -32,14 +32,20 @@ def fetch_articles_without_content():
             sleep(random.randint(3,10))
             if content:
                 # 更新内容
-                article.content = content
-                session.commit()
+                def save():
+                    article.content = content
+                    from core.search import Search
+                    Search.index(session, [article])
+                    session.commit()
+                DB.write(save)
                 print_success(f"成功更新文章 {article.title} 的内容")
             else:
                 print_error(f"获取文章 {article.title} 内容失败")
                 
     except Exception as e:
         print(f"处理过程中发生错误: {e}")
+    finally:
+        session.close()
 from core.task import TaskScheduler
 scheduler=TaskScheduler()
 from core.config import cfg
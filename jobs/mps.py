@@ -1,6 +1,6 @@
 from datetime import datetime
 from core.models.article import Article
-from .article import UpdateArticle,Update_Over
+from .article import UpdateArticles,Update_Over
 import core.db as db
 from core.wx import WxGather
 from core.log import logger
@@ -16,11 +16,7 @@ def fetch_all_article():
     try:
         # 获取公众号列表
         mps=db.DB.get_all_mps()
-        for item in mps:
-            try:
-                wx.get_Articles(item.faker_id,CallBack=UpdateArticle,Mps_id=item.id,Mps_title=item.mp_name, MaxPage=1)
-            except Exception as e:
-                print(e)
+        wx.get_Articles_many(mps,BatchCallBack=UpdateArticles,MaxPage=1)
         print(wx.articles) 
     except Exception as e:
         print(e)         
@@ -39,21 +35,18 @@ def do_job(mps:list[Feed]=None,task:MessageTask=None):
         # TaskQueue.add_task(test,info=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         # print("执行任务", task.mps_id)
         print("执行任务")
-        all_count=0
         wx=WxGather().Model()
-        for item in mps:
-            try:
-                wx.get_Articles(item.faker_id,CallBack=UpdateArticle,Mps_id=item.id,Mps_title=item.mp_name, MaxPage=1,Over_CallBack=Update_Over,interval=interval)
-            except Exception as e:
-                print(e)
-            finally:
-                count=wx.all_count()
-                all_count+=count
+        def mp_over(item:Feed,articles:list):
+                count=len(articles)
                 from jobs.webhook import MessageWebHook 
-                tms=MessageWebHook(task=task,feed=item,articles=wx.articles)
+                tms=MessageWebHook(task=task,feed=item,articles=articles)
                 web_hook(tms)
                 print_success(f"任务[{item.mp_name}]执行成功,{count}成功条数")
-        print_success(f"所有公众号更新完成,共更新{all_count}条数据")
+        try:
+            wx.get_Articles_many(mps,BatchCallBack=UpdateArticles,MaxPage=1,Mp_Over_CallBack=mp_over,Over_CallBack=Update_Over,interval=interval)
+        except Exception as e:
+            print(e)
+        print_success(f"所有公众号更新完成,共更新{wx.all_count()}条数据")
 
 
 def add_job(feeds:list[Feed]=None,task:MessageTask=None):
@@ -13,12 +13,14 @@ def get_message_task() -> list[MessageTask]:
     返回:
         包含消息任务详情的字典，或None如果任务不存在
     """
+    session=DB.get_session()
     try:
-        session=DB.get_session()
         message_task = session.query(MessageTask).filter(MessageTask.status==1).all()
         if not message_task:
             return None
         return message_task
     except Exception as e:
         print(e)
+    finally:
+        session.close()
     return None
\ No newline at end of file
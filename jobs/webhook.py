@@ -81,9 +81,9 @@ def call_webhook(hook: MessageWebHook) -> str:
         logger.error("web_hook_url为空")
         return 
     # 发送webhook请求
-    import requests
+    from core.http_client import Http
     try:
-        response = requests.post(
+        response = Http.post(
             hook.task.web_hook_url,
             data=payload,
             headers={"Content-Type": "application/json"}
@@ -1,8 +1,12 @@
-import uvicorn
-from core.config import cfg
 import threading
 import os
+# 正文解析子进程(spawn)会重新执行本文件，模块级只导入标准库，其余导入放在__main__中
 if __name__ == '__main__':
+    # 打包后的程序启动正文解析子进程时需要
+    import multiprocessing
+    multiprocessing.freeze_support()
+    import uvicorn
+    from core.config import cfg
     if cfg.args.init=="True":
         import init_sys as init
         #如果没有用户，就创建一个
@@ -55,6 +55,24 @@ async def add_custom_header(request: Request, call_next):
     response.headers["GITHUB"] = "https://github.com/rachelos/we-mp-rss"
     response.headers["Server"] = cfg.get("app_name", "WeRSS")
     return response
+@app.on_event("startup")
+def resume_backfill():
+    # 继续重启前未完成的历史回填
+    from core.backfill import Backfill
+    Backfill.run_background()
+@app.on_event("shutdown")
+async def close_async_db():
+    from core.db import ADB
+    await ADB.close()
+@app.on_event("shutdown")
+def close_content_extractor():
+    from core.content_extract import Extractor
+    Extractor.shutdown()
+@app.on_event("shutdown")
+async def close_http_client():
+    from core.http_client import Http
+    await Http.aclose()
+    Http.close()
 # 创建API路由分组
 api_router = APIRouter(prefix=f"{API_BASE}")
 api_router.include_router(auth_router)